@@ -0,0 +1,85 @@
+# bench_batch_scheduling.py
+# Time to (re)schedule N active checks on a running scheduler: the batch path (schedule_jobs_from_check_details,
+# one trigger-building pass, bulk job registration, one executemany for run times) against calling
+# schedule_job_from_check_details once per check. The per-check path is skipped above --per-check-max.
+# Usage (from finops-backend/): python benchmarks/bench_batch_scheduling.py --sizes 10000,100000,1000000 --jobstore sqlite
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def schedule_for(i: int) -> str:
+    """1440 distinct daily-style schedules, all on Feb 29 so no check fires while the benchmark runs."""
+    return f"{i % 60} {i // 60 % 24} 29 2 *"
+
+def populate(num_checks: int):
+    import database
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM scheduled_checks")
+    conn.executemany("""
+        INSERT INTO scheduled_checks (id, tenant_id, natural_query, schedule_string, anomaly_condition_raw,
+            target_service, suggestion, data_source_id, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'active')
+    """, [(f"bench-check-{i}", database.DEFAULT_TENANT_ID, f"bench check {i}", schedule_for(i),
+           "cost > 100", f"BENCH_SVC_{i % 50}", "N/A", None) for i in range(num_checks)])
+    conn.commit()
+    database.release_db_connection(conn)
+    return [dict(row) for row in database.get_all_active_checks_from_db(database.DEFAULT_TENANT_ID)]
+
+async def timed(coroutine_fn, *args):
+    with contextlib.redirect_stdout(io.StringIO()): # Per-check scheduling logs would dominate the timing
+        t0 = time.perf_counter()
+        await coroutine_fn(*args)
+        return time.perf_counter() - t0
+
+async def schedule_one_by_one(main, checks):
+    for check in checks:
+        await main.schedule_job_from_check_details(check)
+
+async def run(sizes: list, per_check_max: int):
+    import main
+    if main.job_store: main.scheduler.add_jobstore(main.job_store, 'default')
+    main.scheduler.start()
+    print(f"{'sqlite' if main.job_store else 'memory'} job store, load shaping {'on' if main.SCHEDULE_LOAD_SHAPING else 'off'}")
+    try:
+        for size in sizes:
+            checks = populate(size)
+            main.scheduler.remove_all_jobs()
+            batch_seconds = await timed(main.schedule_jobs_from_check_details, checks)
+            scheduled = len(main.scheduler.get_jobs())
+            line = f"  {size:>9} checks  batch {batch_seconds:8.2f}s ({size / batch_seconds:9.0f} checks/sec, {scheduled} jobs)"
+            if size <= per_check_max:
+                main.scheduler.remove_all_jobs()
+                per_check_seconds = await timed(schedule_one_by_one, main, checks)
+                line += f"  per-check {per_check_seconds:8.2f}s ({size / per_check_seconds:9.0f} checks/sec)  x{per_check_seconds / batch_seconds:.1f}"
+            print(line)
+            main.scheduler.remove_all_jobs()
+    finally:
+        main.scheduler.shutdown(wait=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch vs per-check scheduling of active checks.")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated check counts")
+    parser.add_argument("--jobstore", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--per-check-max", type=int, default=100_000, help="Largest size also timed on the per-check path")
+    args = parser.parse_args()
+
+    os.environ["FINOPS_SCHEDULER_JOBSTORE"] = args.jobstore # Read when main is imported
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir) # The database is resolved relative to the working directory
+        import database
+        database.init_db()
+        try:
+            asyncio.run(run([int(size) for size in args.sizes.split(",")], args.per_check_max))
+        finally:
+            database.close_all_db_connections()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# bench_db_indexes.py
+# Query latency for the hot listing queries (including deep keyset pages) with and without the migration-6 indexes.
+# Usage (from finops-backend/): python benchmarks/bench_db_indexes.py --alerts 1000000 --checks 20000
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import database
+from database import DEFAULT_TENANT_ID
+
+# Listing indexes from migration 6 (which dropped migration 2's)
+INDEX_NAMES = ["idx_alerts_tenant_time_id", "idx_alerts_tenant_check_time_id", "idx_alerts_tenant_read_time_id",
+               "idx_checks_tenant_created_id", "idx_checks_tenant_status_created_id", "idx_checks_tenant_source_created_id"]
+
+def populate(num_alerts: int, num_checks: int, num_tenants: int):
+    conn = database.get_db_connection()
+    tenants = [DEFAULT_TENANT_ID] + [f"bench-tenant-{i}" for i in range(1, num_tenants)]
+    conn.executemany("INSERT OR IGNORE INTO tenants (id, name) VALUES (?, ?)", [(t, t) for t in tenants])
+    start = datetime.now() - timedelta(days=365)
+    check_rows = []
+    for i in range(num_checks):
+        check_rows.append((f"bench-check-{i}", tenants[i % num_tenants], "bench query", "* * * * *", "cost > 100",
+                           None, "N/A", None, random.choice(["active", "active", "active", "paused"]),
+                           start + timedelta(seconds=i)))
+    conn.executemany("""
+        INSERT INTO scheduled_checks (id, tenant_id, natural_query, schedule_string, anomaly_condition_raw,
+            target_service, suggestion, data_source_id, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, check_rows)
+    batch = []
+    for i in range(num_alerts):
+        check_index = random.randrange(num_checks)
+        batch.append((f"bench-check-{check_index}", tenants[check_index % num_tenants],
+                      start + timedelta(seconds=i * 30), "ALERT bench", None))
+        if len(batch) >= 50000:
+            conn.executemany("INSERT INTO alerts (check_id, tenant_id, alert_time, message, details) VALUES (?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO alerts (check_id, tenant_id, alert_time, message, details) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.execute("ANALYZE")
+
+def deep_alert_cursor(pages: int, limit: int = 50) -> str:
+    cursor = None
+    for _ in range(pages):
+        _, cursor = database.get_alerts_page_from_db(DEFAULT_TENANT_ID, limit, cursor)
+    return cursor
+
+def time_queries(label: str, repeat: int, deep_cursor: str):
+    queries = [
+        ("get_alerts_from_db(limit=50)", lambda: database.get_alerts_from_db(DEFAULT_TENANT_ID, limit=50)),
+        ("alerts page after deep cursor", lambda: database.get_alerts_page_from_db(DEFAULT_TENANT_ID, 50, deep_cursor)),
+        ("alerts page for one check", lambda: database.get_alerts_page_from_db(DEFAULT_TENANT_ID, 50, check_id="bench-check-0")),
+        ("checks page, status=active", lambda: database.get_checks_page_from_db(DEFAULT_TENANT_ID, 50, status="active")),
+        ("get_all_active_checks_from_db", lambda: database.get_all_active_checks_from_db(DEFAULT_TENANT_ID)),
+        ("get_all_checks_for_tenant_from_db", lambda: database.get_all_checks_for_tenant_from_db(DEFAULT_TENANT_ID)),
+    ]
+    for name, query in queries:
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+        print(f"  [{label}] {name:<36} p50 {timings[len(timings) // 2]:8.2f} ms   max {timings[-1]:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot listing queries with and without indexes.")
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--tenants", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database.DATABASE_NAME = os.path.join(tmp_dir, "bench.db")
+        database.init_db()
+        t0 = time.perf_counter()
+        populate(args.alerts, args.checks, args.tenants)
+        print(f"Populated {args.alerts} alerts / {args.checks} checks across {args.tenants} tenants in {time.perf_counter() - t0:.1f}s")
+
+        conn = database.get_db_connection()
+        deep_cursor = deep_alert_cursor(pages=200)
+        time_queries("indexed", args.repeat, deep_cursor)
+        for index_name in INDEX_NAMES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+        conn.commit()
+        time_queries("no index", args.repeat, deep_cursor)
+        database.close_all_db_connections()
+
+if __name__ == '__main__':
+    main()
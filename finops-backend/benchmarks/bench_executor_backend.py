@@ -0,0 +1,92 @@
+# bench_executor_backend.py
+# Checks/sec for the thread and process execution backends at increasing worker counts. Every check reads the
+# same synthetic CSV data source, so the numbers reflect pandas evaluation rather than I/O.
+# Usage (from finops-backend/): python benchmarks/bench_executor_backend.py --checks 200 --rows 200000 --rounds 3
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import wait
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CONDITIONS = ["cost > 120", "units > 900", "cost is more than 20% above the 7-day average",
+              "cost is more than 35% above the 3-day average"]
+
+def write_synthetic_csv(path: str, num_rows: int, num_services: int):
+    services = [f"BENCH_SVC_{i}" for i in range(num_services)]
+    days = max(1, num_rows // num_services)
+    start = date.today() - timedelta(days=days)
+    with open(path, "w") as f:
+        f.write("date,service_name,cost,units\n")
+        for day in range(days):
+            day_str = (start + timedelta(days=day)).isoformat()
+            for service in services:
+                f.write(f"{day_str},{service},{random.uniform(5, 150):.2f},{random.randint(1, 1000)}\n")
+    return services
+
+def populate(num_checks: int, num_rows: int, num_services: int):
+    import database
+    database.init_db()
+    services = write_synthetic_csv("bench_costs.csv", num_rows, num_services)
+    ds_id = f"ds-bench-{uuid.uuid4().hex[:8]}"
+    database.add_data_source(ds_id, database.DEFAULT_TENANT_ID, "Bench CSV", "CSV", {"path": "bench_costs.csv"})
+    check_ids = []
+    for i in range(num_checks):
+        check_id = f"check-bench-{i}"
+        database.add_check_to_db({
+            'id': check_id, 'natural_query': f"bench check {i}", 'schedule_string': "* * * * *",
+            'anomaly_condition_raw': CONDITIONS[i % len(CONDITIONS)], 'target_service': services[i % num_services],
+            'suggestion': "N/A", 'data_source_id': ds_id, 'status': 'active'
+        }, database.DEFAULT_TENANT_ID)
+        check_ids.append(check_id)
+    database.close_all_db_connections()
+    return check_ids
+
+def run_backend(mode: str, workers: int, concurrency: int, check_ids: list, rounds: int):
+    import execution_backend
+    execution_backend.start_execution_backend(mode, workers, concurrency)
+    try:
+        wait([execution_backend.submit_check(check_id) for check_id in check_ids]) # Warm-up: workers load data/state
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            wait([execution_backend.submit_check(check_id) for check_id in check_ids])
+        return len(check_ids) * rounds / (time.perf_counter() - t0)
+    finally:
+        execution_backend.stop_execution_backend()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checks/sec for thread vs process execution backends.")
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--services", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent checks per worker process")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    worker_counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i <= args.max_workers], args.max_workers})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir) # Worker processes resolve the database and CSV relative to the working directory
+        check_ids = populate(args.checks, args.rows, args.services)
+        print(f"{args.checks} checks over a {args.rows}-row CSV, {os.cpu_count()} cores, {args.rounds} timed rounds")
+        stdout_fd = os.dup(1)
+        for mode in ("thread", "process"):
+            for workers in worker_counts:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, 1) # Silence per-check logging (inherited by worker processes)
+                try:
+                    rate = run_backend(mode, workers, args.concurrency, check_ids, args.rounds)
+                finally:
+                    sys.stdout.flush()
+                    os.dup2(stdout_fd, 1)
+                    os.close(devnull)
+                print(f"  {mode:<7} workers={workers:<3} {rate:10.1f} checks/sec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# bench_parse_concurrency.py
+# Fires N parallel /api/parse-query requests at the app while a local fake-OpenAI server answers each
+# completion after a fixed delay. With the async LLM client, wall time should approach
+# ceil(N / FINOPS_LLM_MAX_CONCURRENCY) * delay instead of N * delay.
+# Usage (from finops-backend/): python benchmarks/bench_parse_concurrency.py --requests 16 --delay 0.5
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+FAKE_PARSE = {"scheduleString": "* * * * *", "anomalyCondition": "cost > 100",
+              "targetService": "EC2", "actionableSuggestion": "Review EC2 usage."}
+
+def start_fake_openai(delay_seconds: float):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay_seconds)
+            body = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": "fake",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": json.dumps(FAKE_PARSE)}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run(num_requests: int):
+    import httpx
+    import main
+
+    await main.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            ds = await http.post("/api/datasources", json={"name": "Default FinOps CSV", "type": "CSV", "config": {"path": "sample_data.csv"}})
+            ds_id = ds.json()["id"]
+            t0 = time.perf_counter()
+            responses = await asyncio.gather(*[
+                http.post("/api/parse-query", json={"query": f"Check EC2 costs every minute #{i}", "dataSourceId": ds_id})
+                for i in range(num_requests)
+            ])
+            elapsed = time.perf_counter() - t0
+        failures = [r for r in responses if r.status_code != 201]
+        return elapsed, failures
+    finally:
+        await main.shutdown_event()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark parallel /api/parse-query against a fake OpenAI server.")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.5, help="Fake LLM latency per completion (seconds)")
+    args = parser.parse_args()
+
+    server = start_fake_openai(args.delay)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake-key")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shutil.copy(os.path.join(BACKEND_DIR, "sample_data.csv"), tmp_dir)
+        os.chdir(tmp_dir)
+        elapsed, failures = asyncio.run(run(args.requests))
+    server.shutdown()
+
+    concurrency = int(os.getenv("FINOPS_LLM_MAX_CONCURRENCY", "8"))
+    print(f"{args.requests} parse requests, {args.delay}s fake LLM latency, concurrency cap {concurrency}")
+    print(f"  wall time {elapsed:.2f}s (serialized would be ~{args.requests * args.delay:.2f}s), failures: {len(failures)}")
+    for r in failures[:5]:
+        print(f"  {r.status_code}: {r.text[:200]}")
+
+if __name__ == '__main__':
+    main_cli()
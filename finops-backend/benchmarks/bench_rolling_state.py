@@ -0,0 +1,64 @@
+# bench_rolling_state.py
+# Per-run latency of a "% above N-day average" check against a cached CSV snapshot as its history grows: the
+# incremental path (presorted snapshot, per-service view, rolling state) against a full recompute on a copy.
+# Usage (from finops-backend/): python benchmarks/bench_rolling_state.py --rows 10000,100000,1000000
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+CONDITION = "cost is more than 20% above the 7-day average"
+
+def write_csv(path: str, num_rows: int, num_services: int):
+    days = max(1, num_rows // num_services)
+    start = date(2000, 1, 1)
+    with open(path, "w") as f:
+        f.write("date,service_name,cost\n")
+        for day in range(days):
+            day_str = (start + timedelta(days=day)).isoformat()
+            for service in range(num_services):
+                f.write(f"{day_str},BENCH_SVC_{service},{random.uniform(5, 150):.2f}\n")
+
+def time_runs(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental vs full rolling-average evaluation.")
+    parser.add_argument("--rows", default="10000,100000,1000000", help="Comma-separated history sizes")
+    parser.add_argument("--services", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import executor
+    rule = executor.compile_anomaly_condition(CONDITION)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        executor.SNAPSHOT_DIR = os.path.join(tmp_dir, "snapshots")
+        for num_rows in [int(rows) for rows in args.rows.split(",")]:
+            path = os.path.join(tmp_dir, f"costs_{num_rows}.csv")
+            write_csv(path, num_rows, args.services)
+            with contextlib.redirect_stdout(io.StringIO()):
+                snapshot = executor.load_data_from_csv({"path": path}, executor.rule_columns(rule))
+            unsorted_copy = snapshot.copy()
+            unsorted_copy.attrs.clear() # What a non-snapshot source looks like: copied, converted and sorted every run
+            incremental = time_runs(lambda: executor.parse_anomaly_condition(
+                CONDITION, snapshot, "BENCH_SVC_0", rule, rolling_state_key=("bench", num_rows)), args.repeat)
+            full = time_runs(lambda: executor.parse_anomaly_condition(CONDITION, unsorted_copy, "BENCH_SVC_0", rule), args.repeat)
+            print(f"  {num_rows:>9} rows  incremental p50 {incremental:8.2f} ms   full recompute p50 {full:8.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -3,24 +3,66 @@ import requests
 import base64
 import os
 import json
+import threading
+import time
 from typing import Dict, Any
+from requests.adapters import HTTPAdapter
 
-def get_cisco_ai_response(messages: list, model: str = "gpt-4o", temperature: float = 0.1) -> Dict[str, Any]:
-    """
-    Simple drop-in replacement for OpenAI chat completions using Cisco AI
-    
-    Args:
-        messages: List of message dicts with 'role' and 'content'
-        model: Model name (default: gpt-4o)
-        temperature: Temperature for response generation
-    
-    Returns:
-        Dict with parsed response content (mimics OpenAI response structure)
-    """
-    try:
-        # Get Cisco AI token
-        token_url = 'https://id.cisco.com/oauth2/default/v1/token'
-        credentials = f'{os.getenv("OKTA_CLIENT_ID")}:{os.getenv("OKTA_CLIENT_SECRET")}'
+# Both hosts can be pointed at local stand-ins (CISCO_TOKEN_URL, OPENAI_ENDPOINT); they are read per call
+DEFAULT_TOKEN_URL = 'https://id.cisco.com/oauth2/default/v1/token'
+DEFAULT_AI_ENDPOINT = 'https://chat-ai.cisco.com'
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("CISCO_TOKEN_REFRESH_MARGIN_SECONDS", "120"))
+HTTP_POOL_SIZE = int(os.getenv("CISCO_HTTP_POOL_SIZE", "16"))
+
+# One keep-alive session shared by the token and completion calls, so repeat parses reuse TLS connections
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+_session.mount('https://', _adapter)
+_session.mount('http://', _adapter)
+
+_token_lock = threading.Lock()
+_cached_token = {"key": None, "access_token": None, "expires_at": 0.0}
+
+_stats_lock = threading.Lock()
+_stats = {
+    "token": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "completion": {"count": 0, "total_ms": 0.0, "max_ms": 0.0},
+    "token_cache_hits": 0, "token_refreshes": 0,
+}
+
+def _record_latency(phase: str, started: float):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _stats[phase]["count"] += 1
+        _stats[phase]["total_ms"] += elapsed_ms
+        _stats[phase]["max_ms"] = max(_stats[phase]["max_ms"], elapsed_ms)
+
+def get_cisco_ai_stats() -> Dict[str, Any]:
+    """Per-phase call counts and latencies (token mint, completion) plus token cache hits/refreshes."""
+    with _stats_lock:
+        stats = {key: dict(value) if isinstance(value, dict) else value for key, value in _stats.items()}
+    for phase in ("token", "completion"):
+        count = stats[phase]["count"]
+        stats[phase]["avg_ms"] = round(stats[phase]["total_ms"] / count, 3) if count else 0.0
+    return stats
+
+def invalidate_cached_token():
+    with _token_lock:
+        _cached_token.update(key=None, access_token=None, expires_at=0.0)
+
+def get_access_token() -> str:
+    """Returns a cached OAuth client-credentials token, minting a new one when it is within
+    TOKEN_REFRESH_MARGIN_SECONDS of expiry. Concurrent callers wait for a single refresh."""
+    token_url = os.getenv("CISCO_TOKEN_URL", DEFAULT_TOKEN_URL)
+    client_id = os.getenv("OKTA_CLIENT_ID")
+    cache_key = (token_url, client_id)
+    with _token_lock:
+        if _cached_token["key"] == cache_key and time.time() < _cached_token["expires_at"] - TOKEN_REFRESH_MARGIN_SECONDS:
+            with _stats_lock:
+                _stats["token_cache_hits"] += 1
+            return _cached_token["access_token"]
+
+        credentials = f'{client_id}:{os.getenv("OKTA_CLIENT_SECRET")}'
         encoded_creds = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
         
         token_headers = {
@@ -29,23 +71,40 @@ def get_cisco_ai_response(messages: list, model: str = "gpt-4o", temperature: fl
             'Authorization': f'Basic {encoded_creds}'
         }
         
-        token_response = requests.post(
+        started = time.perf_counter()
+        token_response = _session.post(
             token_url, 
             headers=token_headers, 
             data='grant_type=client_credentials',
             timeout=30
         )
+        _record_latency("token", started)
         token_response.raise_for_status()
-        access_token = token_response.json()['access_token']
+        token_json = token_response.json()
+        _cached_token.update(key=cache_key, access_token=token_json['access_token'],
+                             expires_at=time.time() + float(token_json.get('expires_in', 3600)))
+        with _stats_lock:
+            _stats["token_refreshes"] += 1
+        return _cached_token["access_token"]
+
+def get_cisco_ai_response(messages: list, model: str = "gpt-4o", temperature: float = 0.1) -> Dict[str, Any]:
+    """
+    Simple drop-in replacement for OpenAI chat completions using Cisco AI
+    
+    Args:
+        messages: List of message dicts with 'role' and 'content'
+        model: Model name (default: gpt-4o)
+        temperature: Temperature for response generation
+    
+    Returns:
+        Dict with parsed response content (mimics OpenAI response structure)
+    """
+    try:
+        # Step 1: Get Cisco AI token (cached until shortly before expiry)
+        access_token = get_access_token()
         
         # Step 2: Call Cisco AI endpoint
-        ai_url = f"{os.getenv('OPENAI_ENDPOINT', 'https://chat-ai.cisco.com')}/openai/deployments/{model}/chat/completions"
-        
-        ai_headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {access_token}',
-            'api-key': access_token
-        }
+        ai_url = f"{os.getenv('OPENAI_ENDPOINT', DEFAULT_AI_ENDPOINT)}/openai/deployments/{model}/chat/completions"
         
         ai_payload = {
             'messages': messages,
@@ -54,7 +113,20 @@ def get_cisco_ai_response(messages: list, model: str = "gpt-4o", temperature: fl
             'user': json.dumps({"appkey": os.getenv("OPENAI_APPKEY")})
         }
         
-        ai_response = requests.post(ai_url, headers=ai_headers, json=ai_payload, timeout=60)
+        for attempt in range(2):
+            ai_headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {access_token}',
+                'api-key': access_token
+            }
+            started = time.perf_counter()
+            ai_response = _session.post(ai_url, headers=ai_headers, json=ai_payload, timeout=60)
+            _record_latency("completion", started)
+            if ai_response.status_code != 401 or attempt == 1:
+                break
+            # Token revoked or expired early: mint a fresh one and retry once
+            invalidate_cached_token()
+            access_token = get_access_token()
         ai_response.raise_for_status()
         
         # Step 3: Return in OpenAI-compatible format
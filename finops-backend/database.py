@@ -1,8 +1,11 @@
 # database.py
 import sqlite3
 import json
+import base64
 from datetime import datetime
 import uuid
+import os
+import threading
 
 DATABASE_NAME = "finops_checks.db"
 
@@ -10,13 +13,204 @@ DATABASE_NAME = "finops_checks.db"
 DEFAULT_TENANT_ID = "default-tenant-001"
 DEFAULT_USER_ID = "default-user-001" # Could be owner of the default tenant
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_NAME)
+# --- Connection pool ---
+# One persistent connection per thread (API event loop, scheduler executor threads), opened in WAL mode so
+# readers never block on executor writes. Keeping connections open lets sqlite3 reuse prepared statements
+# (per-connection statement cache). Functions hand connections back with release_db_connection().
+DB_BUSY_TIMEOUT_MS = int(os.getenv("FINOPS_DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE_SIZE = 256
+_thread_local = threading.local()
+_all_connections = [] # Every pooled connection, so shutdown can close them
+_all_connections_lock = threading.Lock()
+_pool_generation = 0 # Bumped by close_all_db_connections so other threads reopen instead of using a closed handle
+
+def _open_db_connection():
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                           cached_statements=DB_STATEMENT_CACHE_SIZE, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS};")
     # Enable foreign key constraint enforcement for this connection
     conn.execute("PRAGMA foreign_keys = ON;")
+    with _all_connections_lock:
+        _all_connections.append(conn)
     return conn
 
+def get_db_connection():
+    conn = getattr(_thread_local, "conn", None)
+    if (conn is None or getattr(_thread_local, "database_name", None) != DATABASE_NAME
+            or getattr(_thread_local, "generation", None) != _pool_generation):
+        conn = _open_db_connection()
+        _thread_local.conn = conn
+        _thread_local.database_name = DATABASE_NAME
+        _thread_local.generation = _pool_generation
+    return conn
+
+def release_db_connection(conn):
+    # Pooled connections stay open; just make sure no half-finished transaction leaks into the next caller
+    if conn.in_transaction:
+        conn.rollback()
+
+def close_all_db_connections():
+    global _pool_generation
+    with _all_connections_lock:
+        _pool_generation += 1
+        for conn in _all_connections:
+            try:
+                release_db_connection(conn)
+                conn.close()
+            except sqlite3.Error as e: print(f"Error closing pooled DB connection: {e}")
+        _all_connections.clear()
+
+# --- Data versions ---
+# A per-tenant counter that every write to checks, alerts or data sources bumps after it commits, so the API can
+# tell whether a cached /api/checks or /api/alerts response is still current without querying. Writes that
+# aren't tied to one tenant (scheduler run times, batched execution outcomes) bump a global epoch instead,
+# which is part of every tenant's version. Listeners (e.g. a process-mode executor worker forwarding its
+# bumps to the API process) are called with the tenant id, or None for a global bump.
+_data_versions = {} # tenant_id -> counter
+_data_epoch = 0
+_data_version_lock = threading.Lock()
+_data_version_listeners = []
+
+def bump_data_version(tenant_id: str = None):
+    global _data_epoch
+    with _data_version_lock:
+        if tenant_id is None: _data_epoch += 1
+        else: _data_versions[tenant_id] = _data_versions.get(tenant_id, 0) + 1
+    for listener in _data_version_listeners:
+        listener(tenant_id)
+
+def get_data_version(tenant_id: str) -> str:
+    with _data_version_lock:
+        return f"{_data_epoch}.{_data_versions.get(tenant_id, 0)}"
+
+def add_data_version_listener(listener):
+    _data_version_listeners.append(listener)
+
+# --- Schema migrations ---
+# Each migration runs once, in order, inside its own transaction; PRAGMA user_version records the last one
+# applied. init_db's CREATE TABLE statements describe the current schema, so migrations must be idempotent
+# against freshly created tables. Append new migrations to the end of SCHEMA_MIGRATIONS, never reorder.
+def _migration_add_anomaly_rule_column(conn):
+    # Databases created before compiled rules existed lack the anomaly_rule column
+    check_columns = [row['name'] for row in conn.execute("PRAGMA table_info(scheduled_checks)").fetchall()]
+    if 'anomaly_rule' not in check_columns:
+        conn.execute("ALTER TABLE scheduled_checks ADD COLUMN anomaly_rule TEXT")
+
+def _migration_add_hot_query_indexes(conn):
+    # get_alerts_from_db: newest alerts for a tenant, served in index order without a sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_tenant_time ON alerts (tenant_id, alert_time DESC)")
+    # get_all_active_checks_from_db
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_checks_tenant_status ON scheduled_checks (tenant_id, status)")
+    # get_all_checks_for_tenant_from_db
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_checks_tenant_created ON scheduled_checks (tenant_id, created_at)")
+
+def _migration_add_llm_parse_cache(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_parse_cache (
+            cache_key TEXT PRIMARY KEY,   -- sha1(prompt_version + normalized query)
+            prompt_version TEXT NOT NULL,
+            normalized_query TEXT NOT NULL,
+            response_json TEXT NOT NULL,
+            created_at REAL NOT NULL,     -- epoch seconds, for TTL
+            last_used_at REAL NOT NULL,   -- epoch seconds, for LRU eviction
+            hit_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_parse_cache_last_used ON llm_parse_cache (last_used_at)")
+
+def _migration_add_scheduler_leases(conn):
+    # Sharded scheduler mode: live worker processes and which of them owns each check shard
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_workers (
+            worker_id TEXT PRIMARY KEY,
+            hostname TEXT,
+            pid INTEGER,
+            started_at REAL NOT NULL,     -- epoch seconds
+            heartbeat_at REAL NOT NULL    -- epoch seconds; stale rows mean the worker is gone
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_shard_leases (
+            shard INTEGER PRIMARY KEY,
+            worker_id TEXT NOT NULL,
+            expires_at REAL NOT NULL      -- epoch seconds; renewed on every heartbeat
+        )
+    """)
+
+def _migration_add_apscheduler_jobs(conn):
+    # job_store.SQLiteJobStore: pickled APScheduler jobs plus a trigger fingerprint for startup reconciliation
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS apscheduler_jobs (
+            id TEXT PRIMARY KEY,
+            next_run_time REAL,           -- UTC epoch seconds; NULL while paused
+            job_state BLOB NOT NULL,
+            fingerprint TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_apscheduler_jobs_next_run ON apscheduler_jobs (next_run_time)")
+
+def _migration_add_keyset_pagination_indexes(conn):
+    # Keyset pagination: each listing filter gets an index ending in the page order (sort column DESC, id DESC),
+    # so a page is one index range scan however deep the cursor is. These supersede migration 2's listing indexes.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_tenant_time_id ON alerts (tenant_id, alert_time DESC, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_tenant_check_time_id ON alerts (tenant_id, check_id, alert_time DESC, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_tenant_read_time_id ON alerts (tenant_id, is_read, alert_time DESC, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_checks_tenant_created_id ON scheduled_checks (tenant_id, created_at DESC, id DESC)")
+    # Also serves get_all_active_checks_from_db through its (tenant_id, status) prefix
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_checks_tenant_status_created_id ON scheduled_checks (tenant_id, status, created_at DESC, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_checks_tenant_source_created_id ON scheduled_checks (tenant_id, data_source_id, created_at DESC, id DESC)")
+    conn.execute("DROP INDEX IF EXISTS idx_alerts_tenant_time")
+    conn.execute("DROP INDEX IF EXISTS idx_checks_tenant_status")
+    conn.execute("DROP INDEX IF EXISTS idx_checks_tenant_created")
+
+def _migration_add_alert_dedup_columns(conn):
+    # Alert deduplication: one open row per incident (dedup_key), updated in place on every repeat occurrence
+    alert_columns = [row['name'] for row in conn.execute("PRAGMA table_info(alerts)").fetchall()]
+    for column, definition in [("dedup_key", "TEXT"), ("state", "TEXT NOT NULL DEFAULT 'open'"),
+                               ("occurrence_count", "INTEGER NOT NULL DEFAULT 1"), ("last_seen", "DATETIME"),
+                               ("last_notified_at", "DATETIME"), ("resolved_at", "DATETIME"),
+                               ("is_flapping", "INTEGER NOT NULL DEFAULT 0")]:
+        if column not in alert_columns:
+            conn.execute(f"ALTER TABLE alerts ADD COLUMN {column} {definition}")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_open_dedup ON alerts (dedup_key) WHERE state = 'open'")
+
+def _migration_add_open_alerts_by_check_index(conn):
+    # get_open_alerts_for_check runs on every check's first evaluation; without this it walks every open incident
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_open_tenant_check ON alerts (tenant_id, check_id) WHERE state = 'open'")
+
+SCHEMA_MIGRATIONS = [
+    (1, "add scheduled_checks.anomaly_rule", _migration_add_anomaly_rule_column),
+    (2, "add indexes for alert/check listing queries", _migration_add_hot_query_indexes),
+    (3, "add llm_parse_cache table", _migration_add_llm_parse_cache),
+    (4, "add scheduler worker/shard lease tables", _migration_add_scheduler_leases),
+    (5, "add apscheduler_jobs persistent job store table", _migration_add_apscheduler_jobs),
+    (6, "add keyset pagination indexes for alert/check listings", _migration_add_keyset_pagination_indexes),
+    (7, "add alert dedup/flap columns and open-incident index", _migration_add_alert_dedup_columns),
+    (8, "add open-alerts-by-check index", _migration_add_open_alerts_by_check_index),
+]
+
+def get_schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn):
+    current_version = get_schema_version(conn)
+    for version, description, migrate in SCHEMA_MIGRATIONS:
+        if version <= current_version:
+            continue
+        try:
+            conn.execute("BEGIN")
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            print(f"Database migration {version} applied: {description}")
+        except Exception:
+            conn.rollback()
+            print(f"Database migration {version} ({description}) failed; schema left at version {get_schema_version(conn)}.")
+            raise
+
 def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -61,6 +255,7 @@ def init_db():
             last_run_at DATETIME,
             next_run_at DATETIME,
             last_run_status TEXT,
+            anomaly_rule TEXT, -- Compiled anomaly rule (JSON), see executor.compile_anomaly_condition
             FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE, -- <<< NEW
             FOREIGN KEY (data_source_id) REFERENCES data_sources (id) ON DELETE SET NULL
         )
@@ -76,25 +271,34 @@ def init_db():
             message TEXT NOT NULL,
             details TEXT,
             is_read INTEGER DEFAULT 0, 
+            dedup_key TEXT, -- (check, service, condition) incident key, see executor.observe_alerts
+            state TEXT NOT NULL DEFAULT 'open', -- 'open' or 'resolved'
+            occurrence_count INTEGER NOT NULL DEFAULT 1,
+            last_seen DATETIME,
+            last_notified_at DATETIME,
+            resolved_at DATETIME,
+            is_flapping INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (tenant_id) REFERENCES tenants (id) ON DELETE CASCADE, -- <<< NEW
             FOREIGN KEY (check_id) REFERENCES scheduled_checks (id) ON DELETE CASCADE
         )
     """)
     conn.commit()
 
+    apply_migrations(conn)
+
     # Add default tenant if it doesn't exist
     cursor.execute("INSERT OR IGNORE INTO tenants (id, name, owner_user_id) VALUES (?, ?, ?)",
                    (DEFAULT_TENANT_ID, "Default Tenant", DEFAULT_USER_ID))
     conn.commit()
 
-    conn.close()
+    release_db_connection(conn)
     print("Database initialized (multi-tenant schema with default tenant).")
 
 # --- Tenant Management (Basic) ---
 def get_tenant_by_id(tenant_id: str):
     conn = get_db_connection()
     tenant = conn.execute("SELECT * FROM tenants WHERE id = ?", (tenant_id,)).fetchone()
-    conn.close()
+    release_db_connection(conn)
     return tenant
 
 # --- Data Source CRUD (Now tenant-aware) ---
@@ -108,31 +312,32 @@ def add_data_source(ds_id: str, tenant_id: str, name: str, ds_type: str, config_
             VALUES (?, ?, ?, ?, ?)
         """, (ds_id, tenant_id, name, ds_type, config_json_str))
         conn.commit()
+        bump_data_version(tenant_id)
         print(f"Data source '{name}' (Tenant: {tenant_id}, ID: {ds_id}, Type: {ds_type}) added.")
         return True
     except sqlite3.IntegrityError as e: # Handles UNIQUE constraint (tenant_id, name)
         print(f"Error adding data source '{name}' for tenant '{tenant_id}': {e}")
         return False
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 def get_data_source_by_id(ds_id: str, tenant_id: str): # Now requires tenant_id
     conn = get_db_connection()
     # Ensure query is tenant-scoped if ds_id might not be globally unique (though UUIDs are)
     source = conn.execute("SELECT * FROM data_sources WHERE id = ? AND tenant_id = ?", (ds_id, tenant_id)).fetchone()
-    conn.close()
+    release_db_connection(conn)
     return source
 
 def get_data_source_by_name(name: str, tenant_id: str): # Now requires tenant_id
     conn = get_db_connection()
     source = conn.execute("SELECT * FROM data_sources WHERE name = ? AND tenant_id = ?", (name, tenant_id)).fetchone()
-    conn.close()
+    release_db_connection(conn)
     return source
 
 def get_all_data_sources(tenant_id: str): # Now requires tenant_id
     conn = get_db_connection()
     sources = conn.execute("SELECT id, name, type, config FROM data_sources WHERE tenant_id = ? ORDER BY name", (tenant_id,)).fetchall()
-    conn.close()
+    release_db_connection(conn)
     return [dict(row) for row in sources]
 
 def delete_data_source_from_db(ds_id: str, tenant_id: str): # Now requires tenant_id
@@ -142,6 +347,7 @@ def delete_data_source_from_db(ds_id: str, tenant_id: str): # Now requires tenan
         # Ensure deletion is tenant-scoped for security, though ds_id should be unique
         cursor = conn.execute("DELETE FROM data_sources WHERE id = ? AND tenant_id = ?", (ds_id, tenant_id))
         conn.commit()
+        bump_data_version(tenant_id)
         if cursor.rowcount > 0:
             print(f"Data source {ds_id} for tenant {tenant_id} deleted from DB.")
             return True
@@ -152,7 +358,29 @@ def delete_data_source_from_db(ds_id: str, tenant_id: str): # Now requires tenan
         print(f"Error deleting data source {ds_id} for tenant {tenant_id} from DB: {e}")
         return False
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+# --- Keyset pagination ---
+# Listings are ordered by (timestamp DESC, id DESC). A page cursor is the opaque, URL-safe encoding of the last
+# row's (timestamp, id); the next page resumes strictly after it with a row-value comparison that the
+# pagination indexes (migration 6) turn into a range scan, instead of an OFFSET that rescans earlier pages.
+def encode_page_cursor(sort_value, row_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id], default=str).encode('utf-8')).decode('ascii').rstrip("=")
+
+def decode_page_cursor(cursor: str) -> tuple:
+    """Raises ValueError for a cursor this module didn't produce."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+    return sort_value, row_id
+
+def _keyset_page(rows, limit, sort_column: str):
+    """Rows were fetched with LIMIT limit + 1; the extra row only signals that another page exists."""
+    if limit is None or len(rows) <= limit:
+        return [dict(row) for row in rows], None
+    page = [dict(row) for row in rows[:limit]]
+    return page, encode_page_cursor(page[-1][sort_column], page[-1]['id'])
 
 # --- Scheduled Check CRUD (Now tenant-aware) ---
 def add_check_to_db(check_data, tenant_id: str): # Requires tenant_id
@@ -162,28 +390,77 @@ def add_check_to_db(check_data, tenant_id: str): # Requires tenant_id
         cursor.execute("""
             INSERT INTO scheduled_checks (
                 id, tenant_id, natural_query, schedule_string, anomaly_condition_raw, 
-                target_service, suggestion, data_source_id, status 
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) 
+                target_service, suggestion, data_source_id, status, anomaly_rule
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) 
         """, (
             check_data['id'], tenant_id, check_data['natural_query'],
             check_data['schedule_string'], check_data['anomaly_condition_raw'],
             check_data.get('target_service'), check_data['suggestion'],
             check_data['data_source_id'], 
-            check_data.get('status', 'active')
+            check_data.get('status', 'active'),
+            check_data.get('anomaly_rule')
         ))
         conn.commit()
+        bump_data_version(tenant_id)
         print(f"Check {check_data['id']} for tenant {tenant_id} added, linked to DS_ID: {check_data['data_source_id']}.")
         return True
     except sqlite3.IntegrityError as e:
         print(f"Error adding check {check_data['id']} for tenant {tenant_id} to DB: {e}")
         return False
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+def add_checks_to_db(checks_data: list, tenant_id: str):
+    """Inserts many checks in one transaction. Returns {check_id: None on success, or the error message}.
+
+    A constraint failure aborts only that row's INSERT, so the remaining checks still commit together.
+    """
+    conn = get_db_connection()
+    results = {}
+    try:
+        for check_data in checks_data:
+            try:
+                conn.execute("""
+                    INSERT INTO scheduled_checks (
+                        id, tenant_id, natural_query, schedule_string, anomaly_condition_raw,
+                        target_service, suggestion, data_source_id, status, anomaly_rule
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    check_data['id'], tenant_id, check_data['natural_query'],
+                    check_data['schedule_string'], check_data['anomaly_condition_raw'],
+                    check_data.get('target_service'), check_data['suggestion'],
+                    check_data['data_source_id'],
+                    check_data.get('status', 'active'),
+                    check_data.get('anomaly_rule')
+                ))
+                results[check_data['id']] = None
+            except sqlite3.IntegrityError as e:
+                print(f"Error adding check {check_data['id']} for tenant {tenant_id} to DB: {e}")
+                results[check_data['id']] = str(e)
+        conn.commit()
+        bump_data_version(tenant_id)
+        print(f"{sum(1 for error in results.values() if error is None)} checks for tenant {tenant_id} added in one transaction.")
+        return results
+    finally:
+        release_db_connection(conn)
+
+def get_checks_by_ids_from_db(check_ids: list, tenant_id: str):
+    conn = get_db_connection()
+    rows = []
+    try:
+        for start in range(0, len(check_ids), 500): # Stay under SQLite's bound-parameter limit
+            chunk = check_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(f"SELECT * FROM scheduled_checks WHERE tenant_id = ? AND id IN ({placeholders})",
+                                     [tenant_id, *chunk]).fetchall())
+        return rows
+    finally:
+        release_db_connection(conn)
 
 def get_check_from_db(check_id: str, tenant_id: str): # Requires tenant_id
     conn = get_db_connection()
     check = conn.execute("SELECT * FROM scheduled_checks WHERE id = ? AND tenant_id = ?", (check_id, tenant_id)).fetchone()
-    conn.close()
+    release_db_connection(conn)
     return check
 
 def get_all_active_checks_from_db(tenant_id: str): # Requires tenant_id
@@ -194,31 +471,51 @@ def get_all_active_checks_from_db(tenant_id: str): # Requires tenant_id
     # If you need tenant-specific loading for scheduler, adjust this.
     # For simplicity, the startup logic in main.py will assume a single (default) tenant for now.
     checks = conn.execute("SELECT * FROM scheduled_checks WHERE status = 'active' AND tenant_id = ?", (tenant_id,)).fetchall()
-    conn.close()
+    release_db_connection(conn)
     return checks
 
 def get_all_checks_for_tenant_from_db(tenant_id: str): # New function for API
+    return get_checks_page_from_db(tenant_id)[0]
+
+def get_checks_page_from_db(tenant_id: str, limit: int = None, cursor: str = None, status: str = None,
+                            data_source_id: str = None, created_after=None, created_before=None):
+    """One page of a tenant's checks, newest first, with their data source's name/type.
+    Returns (rows, next_cursor); next_cursor is None on the last page. limit=None returns every match."""
+    where, params = ["c.tenant_id = ?"], [tenant_id]
+    if status is not None: where.append("c.status = ?"); params.append(status)
+    if data_source_id is not None: where.append("c.data_source_id = ?"); params.append(data_source_id)
+    if created_after is not None: where.append("c.created_at >= ?"); params.append(created_after)
+    if created_before is not None: where.append("c.created_at < ?"); params.append(created_before)
+    if cursor is not None:
+        where.append("(c.created_at, c.id) < (?, ?)"); params.extend(decode_page_cursor(cursor))
     conn = get_db_connection()
-    # This already joins with data_sources for name/type in main.py's /api/checks
-    # So here, just fetch checks for the tenant
-    checks_rows = conn.execute("""
+    checks_rows = conn.execute(f"""
         SELECT c.*, ds.name as dataSourceName, ds.type as dataSourceType
         FROM scheduled_checks c 
         LEFT JOIN data_sources ds ON c.data_source_id = ds.id AND c.tenant_id = ds.tenant_id
-        WHERE c.tenant_id = ?
-        ORDER BY c.created_at DESC
-    """, (tenant_id,)).fetchall()
-    conn.close()
-    return [dict(row) for row in checks_rows]
-
+        WHERE {" AND ".join(where)}
+        ORDER BY c.created_at DESC, c.id DESC
+        LIMIT ?
+    """, (*params, -1 if limit is None else limit + 1)).fetchall()
+    release_db_connection(conn)
+    return _keyset_page(checks_rows, limit, "created_at")
 
 def update_check_status_in_db(check_id: str, status: str, tenant_id: str): # Requires tenant_id
     conn = get_db_connection()
     conn.execute("UPDATE scheduled_checks SET status = ? WHERE id = ? AND tenant_id = ?", (status, check_id, tenant_id))
     conn.commit()
-    conn.close()
+    release_db_connection(conn)
+    bump_data_version(tenant_id)
     print(f"Status for check {check_id} (Tenant: {tenant_id}) updated to {status} in DB.")
 
+def update_checks_status_many(check_ids: list, status: str, tenant_id: str):
+    conn = get_db_connection()
+    conn.executemany("UPDATE scheduled_checks SET status = ? WHERE id = ? AND tenant_id = ?",
+                     [(status, check_id, tenant_id) for check_id in check_ids])
+    conn.commit()
+    release_db_connection(conn)
+    bump_data_version(tenant_id)
+
 def update_check_run_times_in_db(check_id: str, last_run_at, next_run_at, last_run_status="success"):
     # This is called by main.py's scheduler, check_id should be globally unique
     conn = get_db_connection()
@@ -227,7 +524,21 @@ def update_check_run_times_in_db(check_id: str, last_run_at, next_run_at, last_r
         WHERE id = ?
     """, (last_run_at, next_run_at, last_run_status, check_id))
     conn.commit()
-    conn.close()
+    release_db_connection(conn)
+    bump_data_version()
+
+def update_check_run_times_many(run_times: list):
+    """Bulk version of update_check_run_times_in_db; run_times is [(last_run_at, next_run_at, last_run_status, check_id)]."""
+    if not run_times:
+        return
+    conn = get_db_connection()
+    conn.executemany("""
+        UPDATE scheduled_checks SET last_run_at = ?, next_run_at = ?, last_run_status = ?
+        WHERE id = ?
+    """, run_times)
+    conn.commit()
+    release_db_connection(conn)
+    bump_data_version()
 
 def update_check_execution_outcome(check_id: str, last_run_time, last_run_status):
     # This is called by executor.py, check_id should be globally unique
@@ -237,14 +548,16 @@ def update_check_execution_outcome(check_id: str, last_run_time, last_run_status
         UPDATE scheduled_checks SET last_run_at = ?, last_run_status = ? WHERE id = ?
     """, (last_run_time, last_run_status, check_id))
     conn.commit()
-    conn.close()
+    release_db_connection(conn)
+    bump_data_version()
     print(f"Check {check_id} exec outcome updated: Last run {last_run_time}, Status: {last_run_status}")
 
 def delete_check_from_db(check_id: str, tenant_id: str): # Requires tenant_id
     conn = get_db_connection()
     conn.execute("DELETE FROM scheduled_checks WHERE id = ? AND tenant_id = ?", (check_id, tenant_id))
     conn.commit()
-    conn.close()
+    release_db_connection(conn)
+    bump_data_version(tenant_id)
     print(f"Check {check_id} for tenant {tenant_id} deleted from DB.")
 
 # --- Alerts (Now tenant-aware, optional but good) ---
@@ -257,24 +570,247 @@ def add_alert_to_db(check_id: str, message: str, tenant_id: str, details: str =
             VALUES (?, ?, ?, ?, ?)
         """, (check_id, tenant_id, datetime.now(), message, details))
         conn.commit()
+        bump_data_version(tenant_id)
         return cursor.lastrowid
     except Exception as e:
         print(f"Error adding alert for check {check_id}, tenant {tenant_id}: {e}")
         return None
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 def get_alerts_from_db(tenant_id: str, limit=50): # Requires tenant_id
+    return get_alerts_page_from_db(tenant_id, limit)[0]
+
+def get_alerts_page_from_db(tenant_id: str, limit: int = 50, cursor: str = None, check_id: str = None,
+                            is_read: bool = None, since=None, until=None):
+    """One page of a tenant's alerts, newest first. Returns (rows, next_cursor); next_cursor is None on the last page."""
+    where, params = ["tenant_id = ?"], [tenant_id]
+    if check_id is not None: where.append("check_id = ?"); params.append(check_id)
+    if is_read is not None: where.append("is_read = ?"); params.append(int(is_read))
+    if since is not None: where.append("alert_time >= ?"); params.append(since)
+    if until is not None: where.append("alert_time < ?"); params.append(until)
+    if cursor is not None:
+        where.append("(alert_time, id) < (?, ?)"); params.extend(decode_page_cursor(cursor))
     conn = get_db_connection()
-    alerts_rows = conn.execute("""
-        SELECT id, check_id, alert_time, message, details, is_read 
+    alerts_rows = conn.execute(f"""
+        SELECT id, check_id, alert_time, message, details, is_read, dedup_key, state, occurrence_count,
+               last_seen, last_notified_at, resolved_at, is_flapping
         FROM alerts 
-        WHERE tenant_id = ?
-        ORDER BY alert_time DESC 
+        WHERE {" AND ".join(where)}
+        ORDER BY alert_time DESC, id DESC
         LIMIT ?
-    """, (tenant_id, limit)).fetchall()
-    conn.close()
-    return [dict(row) for row in alerts_rows]
+    """, (*params, limit + 1)).fetchall()
+    release_db_connection(conn)
+    return _keyset_page(alerts_rows, limit, "alert_time")
+
+def get_open_alerts_for_check(check_id: str, tenant_id: str):
+    """The check's open deduplicated alerts; executor.observe_alerts rebuilds its incident state from these."""
+    conn = get_db_connection()
+    rows = conn.execute("""
+        SELECT dedup_key, alert_time, occurrence_count, last_notified_at, is_flapping
+        FROM alerts WHERE tenant_id = ? AND check_id = ? AND state = 'open' AND dedup_key IS NOT NULL
+    """, (tenant_id, check_id)).fetchall()
+    release_db_connection(conn)
+    return [dict(row) for row in rows]
+
+def get_parse_cache_entry(cache_key: str, min_created_at: float, now: float):
+    """Returns the cached response JSON if present and not older than min_created_at, touching its LRU timestamp."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT response_json, created_at FROM llm_parse_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        if row['created_at'] < min_created_at:
+            conn.execute("DELETE FROM llm_parse_cache WHERE cache_key = ?", (cache_key,))
+            conn.commit()
+            return None
+        conn.execute("UPDATE llm_parse_cache SET last_used_at = ?, hit_count = hit_count + 1 WHERE cache_key = ?", (now, cache_key))
+        conn.commit()
+        return row['response_json']
+    finally:
+        release_db_connection(conn)
+
+def put_parse_cache_entry(cache_key: str, prompt_version: str, normalized_query: str, response_json: str, now: float, max_entries: int):
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            INSERT OR REPLACE INTO llm_parse_cache (cache_key, prompt_version, normalized_query, response_json, created_at, last_used_at, hit_count)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        """, (cache_key, prompt_version, normalized_query, response_json, now, now))
+        excess = conn.execute("SELECT COUNT(*) FROM llm_parse_cache").fetchone()[0] - max_entries
+        if excess > 0:
+            conn.execute("""
+                DELETE FROM llm_parse_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_parse_cache ORDER BY last_used_at ASC LIMIT ?
+                )
+            """, (excess,))
+        conn.commit()
+        return max(excess, 0)
+    finally:
+        release_db_connection(conn)
+
+# --- Scheduler shard leases ---
+def heartbeat_scheduler_worker(worker_id: str, hostname: str, pid: int, now: float, prune_before: float):
+    """Records a worker heartbeat and returns the ids of workers whose heartbeat is newer than prune_before."""
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            INSERT INTO scheduler_workers (worker_id, hostname, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+        """, (worker_id, hostname, pid, now, now))
+        conn.execute("DELETE FROM scheduler_workers WHERE heartbeat_at < ?", (prune_before,))
+        conn.commit()
+        return [row['worker_id'] for row in conn.execute("SELECT worker_id FROM scheduler_workers ORDER BY worker_id").fetchall()]
+    finally:
+        release_db_connection(conn)
+
+def sync_shard_leases(worker_id: str, desired_shards, now: float, lease_seconds: float):
+    """In one IMMEDIATE transaction: drops this worker's leases on shards it should no longer own, renews the
+    rest, and claims desired shards that are unleased or whose lease has expired. Returns the shards it owns."""
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        desired = sorted(desired_shards)
+        owned_before = [row['shard'] for row in conn.execute("SELECT shard FROM scheduler_shard_leases WHERE worker_id = ?", (worker_id,)).fetchall()]
+        conn.executemany("DELETE FROM scheduler_shard_leases WHERE shard = ? AND worker_id = ?",
+                         [(shard, worker_id) for shard in owned_before if shard not in set(desired)])
+        conn.executemany("""
+            INSERT INTO scheduler_shard_leases (shard, worker_id, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(shard) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at
+            WHERE scheduler_shard_leases.worker_id = excluded.worker_id OR scheduler_shard_leases.expires_at < ?
+        """, [(shard, worker_id, now + lease_seconds, now) for shard in desired])
+        conn.commit()
+        return {row['shard'] for row in conn.execute("SELECT shard FROM scheduler_shard_leases WHERE worker_id = ?", (worker_id,)).fetchall()}
+    finally:
+        release_db_connection(conn)
+
+def release_scheduler_worker(worker_id: str):
+    conn = get_db_connection()
+    try:
+        conn.execute("DELETE FROM scheduler_shard_leases WHERE worker_id = ?", (worker_id,))
+        conn.execute("DELETE FROM scheduler_workers WHERE worker_id = ?", (worker_id,))
+        conn.commit()
+    finally:
+        release_db_connection(conn)
+
+# --- Write-behind batching (executor alerts and execution outcomes) ---
+# execute_check queues its writes here instead of committing per run. A background thread flushes everything
+# queued in one transaction once WRITE_BEHIND_MAX_BATCH items are pending or every WRITE_BEHIND_FLUSH_INTERVAL_SECONDS;
+# stop_write_behind() (from shutdown_event) does a final flush. Without a running flusher, writes go straight through.
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("FINOPS_WRITE_BEHIND_MAX_BATCH", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.getenv("FINOPS_WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "1.0"))
+_write_behind_alerts = [] # (sql, tenant_id, params) alert inserts/occurrences/resolutions, applied in queue order
+_write_behind_outcomes = {} # check_id -> (last_run_time, last_run_status); later outcomes replace earlier ones
+_write_behind_lock = threading.Lock()
+_write_behind_flush_lock = threading.Lock()
+_write_behind_wakeup = threading.Event()
+_write_behind_stop = threading.Event()
+_write_behind_thread = None
+
+def _write_behind_running() -> bool:
+    return _write_behind_thread is not None and _write_behind_thread.is_alive()
+
+INSERT_ALERT_SQL = """
+    INSERT INTO alerts (check_id, tenant_id, alert_time, message, details, dedup_key, last_seen, last_notified_at, is_flapping)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# A repeat of an open incident: bump its counter in place. A re-notification (renotified_at not NULL) also marks it unread.
+ALERT_OCCURRENCE_SQL = """
+    UPDATE alerts SET occurrence_count = occurrence_count + 1, last_seen = ?2, message = ?3, details = ?4, is_flapping = ?5,
+        last_notified_at = COALESCE(?1, last_notified_at), is_read = CASE WHEN ?1 IS NULL THEN is_read ELSE 0 END
+    WHERE dedup_key = ?6 AND state = 'open'
+"""
+RESOLVE_ALERT_SQL = "UPDATE alerts SET state = 'resolved', resolved_at = ? WHERE dedup_key = ? AND state = 'open'"
+
+def queue_alert(check_id: str, message: str, tenant_id: str, details: str = None, dedup_key: str = None, is_flapping: bool = False):
+    """Queues a new alert row. With a dedup_key it opens that incident; repeats go through queue_alert_occurrence."""
+    now = datetime.now()
+    _queue_alert_write(INSERT_ALERT_SQL, tenant_id, (check_id, tenant_id, now, message, details, dedup_key, now, now, int(is_flapping)))
+
+def queue_alert_occurrence(dedup_key: str, tenant_id: str, message: str, details: str = None, is_flapping: bool = False,
+                           renotified_at=None):
+    _queue_alert_write(ALERT_OCCURRENCE_SQL, tenant_id, (renotified_at, datetime.now(), message, details, int(is_flapping), dedup_key))
+
+def queue_alert_resolution(dedup_key: str, tenant_id: str):
+    _queue_alert_write(RESOLVE_ALERT_SQL, tenant_id, (datetime.now(), dedup_key))
+
+def _queue_alert_write(sql: str, tenant_id: str, params: tuple):
+    with _write_behind_lock:
+        _write_behind_alerts.append((sql, tenant_id, params))
+        pending = len(_write_behind_alerts) + len(_write_behind_outcomes)
+    _after_write_behind_enqueue(pending)
+
+def queue_check_execution_outcome(check_id: str, last_run_time, last_run_status):
+    with _write_behind_lock:
+        _write_behind_outcomes[check_id] = (last_run_time, last_run_status)
+        pending = len(_write_behind_alerts) + len(_write_behind_outcomes)
+    _after_write_behind_enqueue(pending)
+
+def _after_write_behind_enqueue(pending: int):
+    if not _write_behind_running():
+        flush_write_behind()
+    elif pending >= WRITE_BEHIND_MAX_BATCH:
+        _write_behind_wakeup.set()
+
+def flush_write_behind():
+    with _write_behind_flush_lock:
+        with _write_behind_lock:
+            alerts = _write_behind_alerts[:]
+            outcomes = dict(_write_behind_outcomes)
+            _write_behind_alerts.clear()
+            _write_behind_outcomes.clear()
+        if not alerts and not outcomes:
+            return 0
+
+        outcome_rows = [(run_time, status, check_id) for check_id, (run_time, status) in outcomes.items()]
+        conn = get_db_connection()
+        try:
+            # In queue order, so an incident opened, repeated and resolved within one batch ends up right
+            for sql, _, params in alerts:
+                # e.g. an alert for a check deleted since it was queued; a failed statement doesn't undo the rest
+                try: conn.execute(sql, params)
+                except sqlite3.IntegrityError as e: print(f"Write-behind: Dropping alert write {params}: {e}")
+            conn.executemany("UPDATE scheduled_checks SET last_run_at = ?, last_run_status = ? WHERE id = ?", outcome_rows)
+            conn.commit()
+            for tenant_id in {tenant_id for _, tenant_id, _ in alerts}: bump_data_version(tenant_id)
+            if outcome_rows: bump_data_version() # Outcomes don't carry a tenant id
+            print(f"Write-behind: Flushed {len(alerts)} alert writes and {len(outcome_rows)} execution outcomes in one transaction.")
+            return len(alerts) + len(outcome_rows)
+        except Exception as e:
+            conn.rollback()
+            print(f"Write-behind: Flush failed ({type(e).__name__} - {e}). Re-queuing {len(alerts)} alert writes and {len(outcome_rows)} outcomes.")
+            with _write_behind_lock:
+                _write_behind_alerts[:0] = alerts
+                for check_id, outcome in outcomes.items():
+                    _write_behind_outcomes.setdefault(check_id, outcome)
+            return 0
+        finally:
+            release_db_connection(conn)
+
+def _write_behind_loop():
+    while not _write_behind_stop.is_set():
+        _write_behind_wakeup.wait(WRITE_BEHIND_FLUSH_INTERVAL_SECONDS)
+        _write_behind_wakeup.clear()
+        flush_write_behind()
+
+def start_write_behind():
+    global _write_behind_thread
+    if _write_behind_running():
+        return
+    _write_behind_stop.clear()
+    _write_behind_thread = threading.Thread(target=_write_behind_loop, name="db-write-behind", daemon=True)
+    _write_behind_thread.start()
+    print(f"Write-behind flusher started (batch {WRITE_BEHIND_MAX_BATCH}, interval {WRITE_BEHIND_FLUSH_INTERVAL_SECONDS}s).")
+
+def stop_write_behind():
+    global _write_behind_thread
+    if _write_behind_thread is not None:
+        _write_behind_stop.set()
+        _write_behind_wakeup.set()
+        _write_behind_thread.join()
+        _write_behind_thread = None
+    flush_write_behind()
+    print("Write-behind flusher stopped; pending writes flushed.")
 
 if __name__ == '__main__':
     init_db() # This will also create the default tenant
@@ -0,0 +1,75 @@
+# database_async.py
+# Awaitable versions of the database.py functions used by the FastAPI endpoints. Calls run on a small
+# dedicated thread pool (each worker keeps its own pooled WAL connection), so a slow query never blocks
+# the event loop or the AsyncIOScheduler running on it.
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+DB_EXECUTOR_WORKERS = int(os.getenv("FINOPS_DB_EXECUTOR_WORKERS", "4"))
+_db_executor = None
+
+def _get_db_executor():
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db-async")
+    return _db_executor
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a synchronous database function on the DB thread pool and awaits its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), functools.partial(fn, *args, **kwargs))
+
+def shutdown_db_executor():
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
+
+# --- Data sources ---
+async def add_data_source(ds_id: str, tenant_id: str, name: str, ds_type: str, config_dict: dict = None):
+    return await run_db(database.add_data_source, ds_id, tenant_id, name, ds_type, config_dict)
+
+async def get_data_source_by_id(ds_id: str, tenant_id: str):
+    return await run_db(database.get_data_source_by_id, ds_id, tenant_id)
+
+async def get_data_source_by_name(name: str, tenant_id: str):
+    return await run_db(database.get_data_source_by_name, name, tenant_id)
+
+async def get_all_data_sources(tenant_id: str):
+    return await run_db(database.get_all_data_sources, tenant_id)
+
+async def delete_data_source_from_db(ds_id: str, tenant_id: str):
+    return await run_db(database.delete_data_source_from_db, ds_id, tenant_id)
+
+# --- Scheduled checks ---
+async def add_check_to_db(check_data, tenant_id: str):
+    return await run_db(database.add_check_to_db, check_data, tenant_id)
+
+async def add_checks_to_db(checks_data: list, tenant_id: str):
+    return await run_db(database.add_checks_to_db, checks_data, tenant_id)
+
+async def get_checks_by_ids_from_db(check_ids: list, tenant_id: str):
+    return await run_db(database.get_checks_by_ids_from_db, check_ids, tenant_id)
+
+async def get_check_from_db(check_id: str, tenant_id: str):
+    return await run_db(database.get_check_from_db, check_id, tenant_id)
+
+async def get_all_active_checks_from_db(tenant_id: str):
+    return await run_db(database.get_all_active_checks_from_db, tenant_id)
+
+async def get_all_checks_for_tenant_from_db(tenant_id: str):
+    return await run_db(database.get_all_checks_for_tenant_from_db, tenant_id)
+
+async def update_check_status_in_db(check_id: str, status: str, tenant_id: str):
+    return await run_db(database.update_check_status_in_db, check_id, status, tenant_id)
+
+async def delete_check_from_db(check_id: str, tenant_id: str):
+    return await run_db(database.delete_check_from_db, check_id, tenant_id)
+
+# --- Alerts ---
+async def get_alerts_from_db(tenant_id: str, limit=50):
+    return await run_db(database.get_alerts_from_db, tenant_id, limit=limit)
@@ -0,0 +1,97 @@
+# event_hub.py
+# Per-tenant, in-process broadcast of live updates for the dashboard's /api/events stream: new alerts and
+# check run outcomes (published by execute_check) and check status changes (published by the API endpoints).
+# publish_event is safe to call from any thread; each subscriber is an asyncio queue on the event loop that
+# subscribed. Every tenant keeps its last EVENT_REPLAY_SIZE events, so a client reconnecting with Last-Event-ID
+# gets what it missed; if that id is older than the replay buffer, from before a restart, or the client fell
+# more than EVENT_SUBSCRIBER_QUEUE_SIZE events behind, it gets a "resync" event and should refetch.
+# Process-mode executor workers forward their events to the API process (see execution_backend). In sharded
+# mode only checks executed in this process are published here.
+import asyncio
+import os
+import threading
+import uuid
+from collections import deque
+
+EVENT_REPLAY_SIZE = int(os.getenv("FINOPS_EVENT_REPLAY_SIZE", "1000"))
+EVENT_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("FINOPS_EVENT_SUBSCRIBER_QUEUE_SIZE", "500"))
+HUB_EPOCH = uuid.uuid4().hex[:8] # Event ids are "<epoch>-<seq>", so ids from before a restart are recognised
+
+class Subscription:
+    def __init__(self, tenant_id: str, loop):
+        self.tenant_id = tenant_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=EVENT_SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: tuple):
+        """Runs on the subscriber's loop. A full queue marks the subscriber for a resync instead of blocking."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class TenantEventHub:
+    def __init__(self, replay_size: int = EVENT_REPLAY_SIZE):
+        self.replay_size = replay_size
+        self._lock = threading.Lock()
+        self._last_seq = {} # tenant_id -> seq of its latest event
+        self._replay = {} # tenant_id -> deque of (event_id, seq, event_type, data)
+        self._subscribers = {} # tenant_id -> set of Subscription
+
+    def publish(self, tenant_id: str, event_type: str, data: dict):
+        with self._lock:
+            seq = self._last_seq.get(tenant_id, 0) + 1
+            self._last_seq[tenant_id] = seq
+            event = (f"{HUB_EPOCH}-{seq}", seq, event_type, data)
+            self._replay.setdefault(tenant_id, deque(maxlen=self.replay_size)).append(event)
+            subscribers = list(self._subscribers.get(tenant_id, ()))
+        for subscription in subscribers:
+            try: subscription.loop.call_soon_threadsafe(subscription.offer, event)
+            except RuntimeError: pass # The subscriber's loop has closed; its stream is going away
+
+    def subscribe(self, tenant_id: str, last_event_id: str = None):
+        """Registers a subscriber on the running loop. Returns (subscription, backlog); backlog is the list of
+        events after last_event_id, or None if they can no longer be replayed and the client must resync."""
+        subscription = Subscription(tenant_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(tenant_id, set()).add(subscription)
+            return subscription, self._backlog_locked(tenant_id, last_event_id)
+
+    def _backlog_locked(self, tenant_id: str, last_event_id: str):
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != HUB_EPOCH or not seq.isdigit():
+            return None
+        replay = self._replay.get(tenant_id, ())
+        seq = int(seq)
+        if seq > self._last_seq.get(tenant_id, 0) or (replay and seq < replay[0][1] - 1):
+            return None
+        return [event for event in replay if event[1] > seq]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.get(subscription.tenant_id, set()).discard(subscription)
+
+_hub = TenantEventHub()
+_event_forwarder = None # Set in executor worker processes; events go to the API process instead of _hub
+
+def set_event_forwarder(forwarder):
+    """forwarder(tenant_id, event_type, data) replaces local publishing (used by process-mode workers)."""
+    global _event_forwarder
+    _event_forwarder = forwarder
+
+def publish_event(tenant_id: str, event_type: str, data: dict):
+    if _event_forwarder is not None:
+        _event_forwarder(tenant_id, event_type, data)
+    else:
+        _hub.publish(tenant_id, event_type, data)
+
+def subscribe_events(tenant_id: str, last_event_id: str = None):
+    return _hub.subscribe(tenant_id, last_event_id)
+
+def unsubscribe_events(subscription: Subscription):
+    _hub.unsubscribe(subscription)
@@ -0,0 +1,225 @@
+# execution_backend.py
+# Where scheduled checks actually run. execute_check is mostly pandas work that holds the GIL, so in "thread"
+# mode concurrent checks share one core; "process" mode dispatches them to long-lived worker processes instead.
+# Each check id is routed to the same worker every time, so a worker's compiled-rule, rolling-window and CSV
+# snapshot caches stay warm for the checks it owns. Scheduler jobs call run_scheduled_check.
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import database
+from event_hub import publish_event, set_event_forwarder
+from executor import execute_check, invalidate_compiled_rule, invalidate_rolling_state, invalidate_incident_state, invalidate_csv_snapshot
+from scheduler_shards import owns_check
+
+EXECUTOR_MODE = os.getenv("FINOPS_EXECUTOR_MODE", "thread").lower() # "thread" or "process"
+EXECUTOR_WORKERS = int(os.getenv("FINOPS_EXECUTOR_WORKERS", "0")) # 0 = pick from the core count
+EXECUTOR_CONCURRENCY_PER_WORKER = int(os.getenv("FINOPS_EXECUTOR_CONCURRENCY_PER_WORKER", "1"))
+# Global cap on checks running at once, from dispatch until they finish (0 = no cap). It is a concurrency cap, not a
+# start-rate limit: a slot is held for the check's whole run, so while long-running checks hold every slot, later
+# fires wait on the event loop and start late.
+MAX_CONCURRENT_CHECKS = int(os.getenv("FINOPS_MAX_CONCURRENT_CHECKS", "0"))
+WORKER_LIVENESS_INTERVAL_SECONDS = 1.0
+# Executor cache invalidations that broadcast_invalidation may run in worker processes, by name
+_INVALIDATORS = {fn.__name__: fn for fn in (invalidate_compiled_rule, invalidate_rolling_state, invalidate_incident_state, invalidate_csv_snapshot)}
+
+def default_worker_count(mode: str) -> int:
+    cores = os.cpu_count() or 1
+    return cores if mode == "process" else min(32, cores + 4)
+
+def _worker_main(task_queue, result_queue, concurrency: int):
+    """Worker process loop: runs check ids from task_queue on `concurrency` threads and reports completions."""
+    database.start_write_behind() # Batch this worker's alert/outcome writes
+    # Forward data-version bumps and live events so the API process's response cache and /api/events
+    # subscribers see this worker's writes
+    database.add_data_version_listener(lambda tenant_id: result_queue.put(("data_version", (tenant_id,))))
+    set_event_forwarder(lambda tenant_id, event_type, data: result_queue.put(("event", (tenant_id, event_type, data))))
+    threads = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="check-worker")
+
+    def run(task_id, check_id):
+        try:
+            execute_check(check_id)
+            result_queue.put((task_id, None))
+        except BaseException as e:
+            result_queue.put((task_id, f"{type(e).__name__}: {e}"))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        if task[0] == "invalidate": # ("invalidate", invalidator name, args) from broadcast_invalidation
+            _INVALIDATORS[task[1]](*task[2])
+            continue
+        threads.submit(run, *task)
+    threads.shutdown(wait=True)
+    database.stop_write_behind()
+    database.close_all_db_connections()
+
+class ThreadCheckBackend:
+    def __init__(self, workers: int, concurrency_per_worker: int = 1):
+        self.workers = workers * concurrency_per_worker
+        self._pool = None
+
+    def start(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="check-exec")
+        print(f"Execution backend: thread mode, {self.workers} threads.")
+
+    def submit(self, check_id: str) -> Future:
+        return self._pool.submit(execute_check, check_id)
+
+    def invalidate(self, invalidator_name: str, args: tuple):
+        pass # Checks run in this process, whose caches broadcast_invalidation already cleared
+
+    def stop(self):
+        if self._pool:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+class ProcessCheckBackend:
+    def __init__(self, workers: int, concurrency_per_worker: int = 1):
+        self.workers = workers
+        self.concurrency_per_worker = concurrency_per_worker
+        self._context = multiprocessing.get_context("spawn") # Don't fork the event loop/scheduler threads
+        self._result_queue = None
+        self._task_queues, self._processes = [], []
+        self._pending = {} # task_id -> (worker_index, Future)
+        self._pending_lock = threading.Lock()
+        self._next_task_id = 0
+        self._collector = None
+        self._running = False
+
+    def _spawn_worker(self, index: int):
+        task_queue = self._context.Queue()
+        process = self._context.Process(target=_worker_main, args=(task_queue, self._result_queue, self.concurrency_per_worker),
+                                        name=f"check-worker-{index}", daemon=True)
+        process.start()
+        return task_queue, process
+
+    def start(self):
+        self._result_queue = self._context.Queue()
+        for index in range(self.workers):
+            task_queue, process = self._spawn_worker(index)
+            self._task_queues.append(task_queue)
+            self._processes.append(process)
+        self._running = True
+        self._collector = threading.Thread(target=self._collect_results, name="check-result-collector", daemon=True)
+        self._collector.start()
+        print(f"Execution backend: process mode, {self.workers} workers x {self.concurrency_per_worker} concurrent checks.")
+
+    def worker_for(self, check_id: str) -> int:
+        return int(hashlib.md5(check_id.encode('utf-8')).hexdigest(), 16) % self.workers
+
+    def submit(self, check_id: str) -> Future:
+        future = Future()
+        index = self.worker_for(check_id)
+        with self._pending_lock:
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._pending[task_id] = (index, future)
+        self._task_queues[index].put((task_id, check_id))
+        return future
+
+    def invalidate(self, invalidator_name: str, args: tuple):
+        """Every worker keeps its own executor caches, so an invalidation goes to all of them."""
+        for task_queue in self._task_queues:
+            task_queue.put(("invalidate", invalidator_name, args))
+
+    def _collect_results(self):
+        next_liveness_check = time.monotonic() + WORKER_LIVENESS_INTERVAL_SECONDS
+        while self._running or self._pending:
+            # Checked on a timer rather than only when idle, so a crashed worker is replaced under steady load too
+            if time.monotonic() >= next_liveness_check:
+                self._replace_dead_workers()
+                next_liveness_check = time.monotonic() + WORKER_LIVENESS_INTERVAL_SECONDS
+            try:
+                task_id, error = self._result_queue.get(timeout=WORKER_LIVENESS_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            if task_id == "data_version": # Forwarded by a worker, not a task result
+                database.bump_data_version(*error)
+                continue
+            if task_id == "event":
+                publish_event(*error)
+                continue
+            with self._pending_lock:
+                _, future = self._pending.pop(task_id, (None, None))
+            if future is not None:
+                if error: future.set_exception(RuntimeError(error))
+                else: future.set_result(None)
+
+    def _replace_dead_workers(self):
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or not self._running:
+                continue
+            print(f"Execution backend: worker {index} exited (code {process.exitcode}); restarting it.")
+            with self._pending_lock:
+                lost = [task_id for task_id, (worker, _) in self._pending.items() if worker == index]
+                for task_id in lost:
+                    self._pending.pop(task_id)[1].set_exception(RuntimeError(f"Worker {index} died while running the check."))
+            self._task_queues[index], self._processes[index] = self._spawn_worker(index)
+
+    def stop(self):
+        self._running = False
+        for task_queue in self._task_queues:
+            task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=60)
+        if self._collector:
+            self._collector.join(timeout=5)
+        self._task_queues, self._processes = [], []
+
+_backend = None
+_concurrency_semaphore = None
+
+def start_execution_backend(mode: str = None, workers: int = None, concurrency_per_worker: int = None):
+    global _backend
+    mode = (mode or EXECUTOR_MODE).lower()
+    workers = workers or EXECUTOR_WORKERS or default_worker_count(mode)
+    concurrency_per_worker = concurrency_per_worker or EXECUTOR_CONCURRENCY_PER_WORKER
+    if mode not in ("thread", "process"):
+        raise ValueError(f"Unknown FINOPS_EXECUTOR_MODE '{mode}' (expected 'thread' or 'process').")
+    backend_class = ProcessCheckBackend if mode == "process" else ThreadCheckBackend
+    _backend = backend_class(workers, concurrency_per_worker)
+    _backend.start()
+    return _backend
+
+def stop_execution_backend():
+    global _backend, _concurrency_semaphore
+    _concurrency_semaphore = None # Bound to the event loop that is shutting down
+    if _backend is not None:
+        _backend.stop()
+        _backend = None
+
+def broadcast_invalidation(invalidator, *args):
+    """Runs an executor cache invalidation (e.g. invalidate_compiled_rule) in this process and, in process mode,
+    in every worker, since each worker keeps its own caches."""
+    invalidator(*args)
+    if _backend is not None:
+        _backend.invalidate(invalidator.__name__, args)
+
+def submit_check(check_id: str) -> Future:
+    if _backend is None:
+        start_execution_backend()
+    return _backend.submit(check_id)
+
+async def run_scheduled_check(check_id: str):
+    """APScheduler job target: runs the check on the configured backend without blocking the event loop."""
+    global _concurrency_semaphore
+    if not owns_check(check_id):
+        print(f"Execution backend: skipping {check_id}; this worker no longer holds its shard lease.")
+        return
+    if MAX_CONCURRENT_CHECKS > 0 and _concurrency_semaphore is None:
+        _concurrency_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHECKS)
+    try:
+        if _concurrency_semaphore is None:
+            await asyncio.wrap_future(submit_check(check_id))
+        else:
+            async with _concurrency_semaphore:
+                await asyncio.wrap_future(submit_check(check_id))
+    except Exception as e:
+        print(f"Execution backend: check {check_id} failed: {e}")
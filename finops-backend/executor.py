@@ -3,27 +3,256 @@ import pandas as pd
 from datetime import datetime, timedelta
 import json
 import random 
+import os
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict, deque
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc
+except ImportError: # Columnar snapshots are optional; CSV sources fall back to pandas parsing
+    pa = None
 
 from database import (
-    get_check_from_db, update_check_execution_outcome, 
-    add_alert_to_db, get_data_source_by_id, 
-    DEFAULT_TENANT_ID # Import for use in add_alert_to_db if check's tenant_id isn't easily available
+    get_check_from_db, queue_check_execution_outcome, 
+    queue_alert, queue_alert_occurrence, queue_alert_resolution, get_open_alerts_for_check, get_data_source_by_id, 
+    DEFAULT_TENANT_ID # Import for use in queue_alert if check's tenant_id isn't easily available
 )
+from event_hub import publish_event
 
 # Global toggle for AWS Mock 'real-time' spike simulation
 aws_mock_should_add_realtime_spike_next = False
 
-def parse_anomaly_condition(condition_str: str, data_df: pd.DataFrame, local_service_filter: str = None):
-    print(f"Executor: Parsing condition: '{condition_str}' for service: {local_service_filter or 'Overall'}")
+# --- Compiled anomaly rules ---
+# Conditions are tokenized once (at check creation) into a JSON-serializable rule dict that is stored
+# with the check in `scheduled_checks.anomaly_rule`. execute_check only evaluates the compiled rule.
+RULE_VERSION = 1
+FIXED_THRESHOLD_KEYWORDS = ['>', '<', 'exceeds', 'above', 'greater', 'less', 'below', 'is ']
+POSSIBLE_OPERATORS = { '>': ['>', 'greater', 'exceeds', 'above', 'over'], '<': ['<', 'less', 'below', 'under'] }
+
+# In-process cache: (check_id, condition_hash) -> compiled rule dict
+_compiled_rule_cache = {}
+_compiled_rule_cache_lock = threading.Lock()
+
+def condition_hash(condition_str: str) -> str:
+    return hashlib.sha1((condition_str or "").encode('utf-8')).hexdigest()
+
+def compile_anomaly_condition(condition_str: str) -> dict:
+    """Tokenizes an anomaly condition string once into an executable rule dict.
+
+    Rule types: 'percentage_average' (X% above N-day average), 'fixed_threshold' (> / < value),
+    'invalid' (recognized but unparseable) and 'unrecognized'.
+    """
+    condition_str = condition_str or ""
+    condition_lower = condition_str.lower()
+    rule = {"version": RULE_VERSION, "condition_hash": condition_hash(condition_str)}
+
+    if 'above' in condition_lower and 'average' in condition_lower and '%' in condition_str:
+        try:
+            parts = condition_lower.split()
+            percentage_str = next(p for p in parts if '%' in p)
+            percentage = float(percentage_str.replace('%', '')) / 100.0
+            days_str = next(p for p in parts if '-day' in p)
+            window = int(days_str.split('-')[0])
+            rule.update({"type": "percentage_average", "metric_col": "cost", "percentage": percentage, "window": window})
+        except StopIteration:
+            rule.update({"type": "invalid", "reason": f"Could not parse percentage/days from condition string: '{condition_str}'"})
+        except Exception as e:
+            rule.update({"type": "invalid", "reason": f"Error in percentage average logic: {type(e).__name__} - {e}"})
+        return rule
+
+    if any(op_keyword in condition_lower for op_keyword in FIXED_THRESHOLD_KEYWORDS):
+        parts = condition_str.replace('$', '').lower().split()
+        for i in range(len(parts) - 1, 0, -1):
+            try:
+                value = float(parts[i])
+            except ValueError:
+                continue
+            operator_phrase_words = []
+            for j in range(i - 1, -1, -1):
+                operator_phrase_words.insert(0, parts[j])
+                current_phrase = " ".join(operator_phrase_words)
+                for sym, keywords in POSSIBLE_OPERATORS.items():
+                    if current_phrase in keywords or any(kw in current_phrase for kw in keywords):
+                        # Metric column candidates, in order of preference; resolved against the data's columns at evaluation.
+                        metric_candidates = []
+                        metric_candidate_index = j - 1
+                        first_word_is_metric = parts[0].isalpha() and parts[0] not in current_phrase
+                        if metric_candidate_index >= 0 and parts[metric_candidate_index].isalpha():
+                            metric_candidates.append(parts[metric_candidate_index])
+                            if metric_candidate_index > 0:
+                                metric_candidates.append(f"{parts[metric_candidate_index-1]}_{parts[metric_candidate_index]}")
+                        if first_word_is_metric and parts[0] not in metric_candidates:
+                            metric_candidates.append(parts[0])
+                        rule.update({"type": "fixed_threshold", "operator": sym, "threshold": value,
+                                     "metric_col": "cost", "metric_candidates": metric_candidates})
+                        return rule
+        rule.update({"type": "invalid", "reason": f"Could not reliably parse operator/value from: '{condition_str}'"})
+        return rule
+
+    rule.update({"type": "unrecognized", "reason": f"Condition type not recognized by current parsers: '{condition_str}'"})
+    return rule
+
+def get_compiled_rule(check_id: str, condition_str: str, stored_rule_json: str = None) -> dict:
+    """Returns the compiled rule for a check, from the in-process cache, the stored rule, or a fresh compile."""
+    key = (check_id, condition_hash(condition_str))
+    with _compiled_rule_cache_lock:
+        rule = _compiled_rule_cache.get(key)
+    if rule is not None:
+        return rule
+
+    rule = None
+    if stored_rule_json:
+        try:
+            stored_rule = json.loads(stored_rule_json)
+            if stored_rule.get("version") == RULE_VERSION and stored_rule.get("condition_hash") == key[1]:
+                rule = stored_rule
+        except (ValueError, AttributeError) as e:
+            print(f"Executor: Ignoring malformed stored rule for check {check_id}: {e}")
+    if rule is None:
+        rule = compile_anomaly_condition(condition_str)
+
+    with _compiled_rule_cache_lock:
+        _compiled_rule_cache[key] = rule
+    return rule
+
+def rule_columns(rule: dict):
+    """Columns a rule reads (date, service_name and metric candidates), or None when all columns are needed."""
+    if rule.get("type") not in ("percentage_average", "fixed_threshold"):
+        return None
+    return list(dict.fromkeys(['date', 'service_name', *rule.get("metric_candidates", []), rule.get("metric_col", "cost")]))
+
+def invalidate_compiled_rule(check_id: str):
+    with _compiled_rule_cache_lock:
+        for key in [k for k in _compiled_rule_cache if k[0] == check_id]:
+            del _compiled_rule_cache[key]
+
+# --- Incremental rolling-window state ---
+# "X% above N-day average" checks keep, per (check, service, condition), a ring buffer of the N values preceding
+# the latest row plus their running sum/count, and a fingerprint of those rows. Appended rows update the average in
+# O(1) each; a rewritten history (row count shrank, too many new rows, or any row the state covers was restated,
+# e.g. a refreshed CSV) no longer matches the fingerprint and is rebuilt from the last N+1 rows.
+_rolling_states = {} # (check_id, service, condition_hash) -> state dict
+_rolling_states_lock = threading.Lock()
+
+def _window_fingerprint(data: pd.DataFrame, metric_col: str, n_rows: int, window: int) -> bytes:
+    """Hash of the rows a state built on the first n_rows rows depends on: its window plus the then-latest row."""
+    columns = ['date', metric_col] if 'date' in data.columns else [metric_col]
+    covered = data[columns].iloc[max(0, n_rows - window - 1):n_rows]
+    return pd.util.hash_pandas_object(covered, index=False).values.tobytes()
+
+def _push_rolling_value(state: dict, value):
+    buffer = state["buffer"]
+    if len(buffer) == buffer.maxlen:
+        evicted = buffer[0]
+        if not pd.isna(evicted):
+            state["sum"] -= evicted
+            state["count"] -= 1
+    buffer.append(value)
+    if not pd.isna(value):
+        state["sum"] += value
+        state["count"] += 1
+
+def _rebuild_rolling_state(data: pd.DataFrame, metric_col: str, window: int) -> dict:
+    state = {"window": window, "buffer": deque(maxlen=window), "sum": 0.0, "count": 0}
+    for value in data[metric_col].iloc[-(window + 1):-1]:
+        _push_rolling_value(state, value)
+    return state
+
+def incremental_moving_average(state_key: tuple, data: pd.DataFrame, metric_col: str, window: int):
+    """Mean of the `window` values preceding the latest row (same result as rolling(window, min_periods=1).mean().shift(1))."""
+    n_rows = len(data)
+    with _rolling_states_lock:
+        state = _rolling_states.get(state_key)
+        appended = n_rows - state["n_rows"] if state else -1
+        if (state is None or state["window"] != window or state["metric_col"] != metric_col or not 0 <= appended <= window
+                or _window_fingerprint(data, metric_col, state["n_rows"], window) != state["fingerprint"]):
+            state = _rebuild_rolling_state(data, metric_col, window)
+        else:
+            # Each appended row pushes the previous latest value into the window
+            for position in range(n_rows - appended - 1, n_rows - 1):
+                _push_rolling_value(state, data[metric_col].iat[position])
+        state.update({"metric_col": metric_col, "n_rows": n_rows, "fingerprint": _window_fingerprint(data, metric_col, n_rows, window)})
+        _rolling_states[state_key] = state
+        return state["sum"] / state["count"] if state["count"] else float('nan')
+
+def invalidate_rolling_state(check_id: str):
+    with _rolling_states_lock:
+        for key in [k for k in _rolling_states if k[0] == check_id]:
+            del _rolling_states[key]
+
+# --- All-services evaluation mode ---
+# A check whose target_service is one of these evaluates its rule for every service_name group in one
+# vectorized pass and reports each breaching service.
+ALL_SERVICES_TARGETS = {'all', 'all services', 'any', 'any service', 'each service', 'every service', '*'}
+
+def is_all_services_target(target_service: str) -> bool:
+    return bool(target_service) and target_service.strip().lower() in ALL_SERVICES_TARGETS
+
+def evaluate_rule_all_services(rule: dict, current_data: pd.DataFrame) -> pd.Series:
+    """Evaluates a compiled rule against the latest row of every service. Expects date-sorted data.
+
+    Returns a boolean Series indexed by service_name (True = breaching); empty when the rule can't be evaluated.
+    """
+    rule_type = rule.get("type")
+    if rule_type == "percentage_average":
+        metric_col = rule["metric_col"]
+    elif rule_type == "fixed_threshold":
+        metric_col = next((c for c in rule.get("metric_candidates", []) if c in current_data.columns), rule.get("metric_col", "cost"))
+    else:
+        print(f"Executor: {rule.get('reason', 'Condition type not recognized by current parsers.')}")
+        return pd.Series(dtype=bool)
+    if metric_col not in current_data.columns:
+        print(f"Executor: Metric column '{metric_col}' not found for all-services evaluation.")
+        return pd.Series(dtype=bool)
+
+    groups = current_data.groupby('service_name', sort=False)
+    latest_rows = groups.tail(1)
+    latest_values = latest_rows.set_index('service_name')[metric_col]
+
+    if rule_type == "percentage_average":
+        window = rule["window"]
+        # Mean of the `window` rows preceding each service's latest row (rolling(window, min_periods=1).mean().shift(1))
+        preceding = groups.tail(window + 1).drop(index=latest_rows.index)
+        moving_avgs = preceding.groupby('service_name', sort=False)[metric_col].mean().reindex(latest_values.index)
+        thresholds = moving_avgs * (1 + rule["percentage"])
+        breaching = (latest_values > thresholds).fillna(False)
+    elif rule["operator"] == '>':
+        breaching = (latest_values > rule["threshold"]).fillna(False)
+    else:
+        breaching = (latest_values < rule["threshold"]).fillna(False)
+
+    breaching = breaching.astype(bool)
+    print(f"Executor: All-services evaluation: {int(breaching.sum())}/{len(breaching)} services breaching {metric_col} rule: {list(breaching[breaching].index)}")
+    return breaching
+
+def parse_anomaly_condition(condition_str: str, data_df: pd.DataFrame, local_service_filter: str = None, rule: dict = None, rolling_state_key: tuple = None):
+    print(f"Executor: Evaluating condition: '{condition_str}' for service: {local_service_filter or 'Overall'}")
+    if rule is None:
+        rule = compile_anomaly_condition(condition_str)
     
     if data_df.empty:
         print("Executor: Initial data_df is empty for parse_anomaly_condition.")
         return pd.Series(dtype=bool) # Return empty boolean Series
 
-    current_data = data_df.copy() # Work on a copy
-
-    if local_service_filter and local_service_filter.lower() != 'overall' and 'service_name' in current_data.columns:
-        current_data = current_data[current_data['service_name'].str.lower() == local_service_filter.lower()].copy()
+    # A cached CSV snapshot is already date-typed and sorted, and is never mutated below, so it is used as is:
+    # per-run cost then doesn't grow with the history (service filters come from a per-snapshot view cache)
+    presorted = bool(data_df.attrs.get(DATE_SORTED_ATTR))
+    current_data = data_df if presorted else data_df.copy() # Work on a copy
+    all_services_mode = is_all_services_target(local_service_filter)
+
+    if all_services_mode:
+        if 'service_name' not in current_data.columns:
+            print(f"Executor: All-services mode requested, but 'service_name' column not in data. Processing all passed data as one series.")
+            all_services_mode = False
+    elif local_service_filter and local_service_filter.lower() != 'overall' and 'service_name' in current_data.columns:
+        if presorted:
+            current_data = snapshot_service_view(current_data, local_service_filter)
+        else:
+            current_data = current_data[current_data['service_name'].str.lower() == local_service_filter.lower()].copy()
         if current_data.empty:
             print(f"Executor: No data found for service filter: '{local_service_filter}'")
             return pd.Series(dtype=bool) # Return empty boolean Series
@@ -34,9 +263,9 @@ def parse_anomaly_condition(condition_str: str, data_df: pd.DataFrame, local_ser
         print("Executor: No data to process for anomaly condition after any filtering.")
         return pd.Series(dtype=bool)
 
-    potential_anomalies = pd.Series([False] * len(current_data.index), index=current_data.index)
+    potential_anomalies = pd.Series(False, index=current_data.index)
 
-    if 'date' in current_data.columns:
+    if 'date' in current_data.columns and not presorted:
         try:
             current_data['date'] = pd.to_datetime(current_data['date'])
             current_data = current_data.sort_values(by='date')
@@ -44,14 +273,19 @@ def parse_anomaly_condition(condition_str: str, data_df: pd.DataFrame, local_ser
             print(f"Executor: Error converting 'date' column: {e_date}")
             return potential_anomalies
 
-    if 'above' in condition_str.lower() and 'average' in condition_str.lower() and '%' in condition_str:
+    if all_services_mode:
         try:
-            parts = condition_str.lower().split()
-            percentage_str = next(p for p in parts if '%' in p)
-            percentage = float(percentage_str.replace('%', '')) / 100.0
-            days_str = next(p for p in parts if '-day' in p)
-            window = int(days_str.split('-')[0])
-            metric_col = 'cost' 
+            return evaluate_rule_all_services(rule, current_data)
+        except Exception as e:
+            print(f"Executor: Error in all-services evaluation: {type(e).__name__} - {e}")
+            return potential_anomalies
+
+    rule_type = rule.get("type")
+    if rule_type == "percentage_average":
+        try:
+            percentage = rule["percentage"]
+            window = rule["window"]
+            metric_col = rule["metric_col"]
 
             if metric_col not in current_data.columns:
                 print(f"Executor: Metric '{metric_col}' not found in current_data.")
@@ -61,73 +295,37 @@ def parse_anomaly_condition(condition_str: str, data_df: pd.DataFrame, local_ser
                  print(f"Executor: Not enough data points ({len(current_data)}) for percentage average check after filtering.")
                  return potential_anomalies
 
-            current_data['moving_avg'] = current_data[metric_col].rolling(window=window, min_periods=1).mean().shift(1)
-            
             if current_data.iloc[-1:].empty:
                  print("Executor: No data available to check latest entry for percentage average (possibly after shift).")
                  return potential_anomalies
 
             latest_entry = current_data.iloc[-1]
-            if pd.isna(latest_entry['moving_avg']): 
+            if rolling_state_key is not None:
+                moving_avg = incremental_moving_average((*rolling_state_key, rule.get("condition_hash")), current_data, metric_col, window)
+            else:
+                moving_avg = current_data[metric_col].rolling(window=window, min_periods=1).mean().shift(1).iloc[-1]
+            if pd.isna(moving_avg): 
                 print(f"Executor: Moving average is NaN for latest entry. Not enough data for {window}-day MA for {local_service_filter or 'overall'}.")
                 return potential_anomalies
 
-            threshold = latest_entry['moving_avg'] * (1 + percentage)
+            threshold = moving_avg * (1 + percentage)
             is_anomaly = latest_entry[metric_col] > threshold
             
             if is_anomaly:
-                print(f"Executor: ANOMALY (Percentage): {local_service_filter or 'Overall'} {metric_col} {latest_entry[metric_col]:.2f} > {percentage*100:.0f}% above {window}-day avg ({latest_entry['moving_avg']:.2f}), threshold {threshold:.2f}")
+                print(f"Executor: ANOMALY (Percentage): {local_service_filter or 'Overall'} {metric_col} {latest_entry[metric_col]:.2f} > {percentage*100:.0f}% above {window}-day avg ({moving_avg:.2f}), threshold {threshold:.2f}")
                 potential_anomalies.loc[latest_entry.name] = True
             else:
-                print(f"Executor: OK (Percentage): {local_service_filter or 'Overall'} {metric_col} {latest_entry[metric_col]:.2f} vs avg {latest_entry['moving_avg']:.2f}, threshold {threshold:.2f}")
-            return potential_anomalies
-        except StopIteration: 
-            print(f"Executor: Could not parse percentage/days from condition string: '{condition_str}'")
+                print(f"Executor: OK (Percentage): {local_service_filter or 'Overall'} {metric_col} {latest_entry[metric_col]:.2f} vs avg {moving_avg:.2f}, threshold {threshold:.2f}")
             return potential_anomalies
         except Exception as e:
             print(f"Executor: Error in percentage average logic: {type(e).__name__} - {e}")
             return potential_anomalies
 
-    elif any(op_keyword in condition_str.lower() for op_keyword in ['>', '<', 'exceeds', 'above', 'greater', 'less', 'below', 'is ']):
+    elif rule_type == "fixed_threshold":
         try:
-            parts = condition_str.replace('$', '').lower().split()
-            metric_col = 'cost' 
-            value_str = None
-            value = None
-            operator_symbol = None
-            possible_operators = { '>': ['>', 'greater', 'exceeds', 'above', 'over'], '<': ['<', 'less', 'below', 'under'] }
-
-            found_op_val = False
-            for i in range(len(parts) -1, 0, -1): 
-                try:
-                    val_candidate = parts[i]
-                    value = float(val_candidate)
-                    value_str = val_candidate 
-                    operator_phrase_words = []
-                    for j in range(i - 1, -1, -1):
-                        word = parts[j]
-                        operator_phrase_words.insert(0, word)
-                        current_phrase = " ".join(operator_phrase_words)
-                        for sym, keywords in possible_operators.items():
-                            if current_phrase in keywords or any(kw in current_phrase for kw in keywords):
-                                operator_symbol = sym
-                                metric_candidate_index = j - 1
-                                if metric_candidate_index >= 0 and parts[metric_candidate_index].isalpha():
-                                    if parts[metric_candidate_index] in current_data.columns: metric_col = parts[metric_candidate_index]
-                                    elif metric_candidate_index > 0 and f"{parts[metric_candidate_index-1]}_{parts[metric_candidate_index]}" in current_data.columns:
-                                        metric_col = f"{parts[metric_candidate_index-1]}_{parts[metric_candidate_index]}"
-                                    elif parts[0].isalpha() and parts[0] in current_data.columns and parts[0] not in current_phrase:
-                                        metric_col = parts[0] 
-                                elif parts[0].isalpha() and parts[0] in current_data.columns and parts[0] not in current_phrase : 
-                                    metric_col = parts[0]
-                                break 
-                        if operator_symbol: break 
-                    if operator_symbol: found_op_val = True; break 
-                except ValueError: continue 
-            
-            if not found_op_val or not operator_symbol:
-                print(f"Executor: Could not reliably parse operator/value from: '{condition_str}'")
-                return potential_anomalies
+            value = rule["threshold"]
+            operator_symbol = rule["operator"]
+            metric_col = next((c for c in rule.get("metric_candidates", []) if c in current_data.columns), rule.get("metric_col", "cost"))
 
             if metric_col not in current_data.columns:
                 print(f"Executor: Metric column '{metric_col}' (parsed/defaulted) not found for fixed threshold.")
@@ -149,22 +347,184 @@ def parse_anomaly_condition(condition_str: str, data_df: pd.DataFrame, local_ser
                 print(f"Executor: OK (Fixed): {local_service_filter or 'Overall'} {metric_col} {latest_entry[metric_col]:.2f} vs threshold {operator_symbol} {value:.2f}")
             return potential_anomalies
         except Exception as e:
-            print(f"Executor: Error parsing fixed threshold: '{condition_str}': {type(e).__name__} - {e}")
+            print(f"Executor: Error evaluating fixed threshold: '{condition_str}': {type(e).__name__} - {e}")
             return potential_anomalies
     else:
-        print(f"Executor: Condition type not recognized by current parsers: '{condition_str}'")
+        print(f"Executor: {rule.get('reason', f'Condition type not recognized by current parsers: {condition_str!r}')}")
         return potential_anomalies
 
 # Data Fetchers (load_data_from_csv, generate_mock_dataframe, fetch_mock_..._data functions)
 # ... (Paste your latest working versions of all these functions here, including the AWS dynamic spike) ...
-def load_data_from_csv(config: dict):
+# --- CSV snapshot cache ---
+# Parsed, date-sorted CSV DataFrames keyed on file identity (path, mtime, size) and column projection, evicted LRU-first once the
+# byte budget is exceeded. Cached frames are shared between checks; parse_anomaly_condition never mutates them.
+CSV_CACHE_MAX_BYTES = int(os.getenv("FINOPS_CSV_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+_csv_snapshot_cache = OrderedDict() # (abs_path, mtime_ns, size, columns) -> (df, nbytes)
+_csv_snapshot_cache_bytes = 0
+_csv_snapshot_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_csv_snapshot_cache_lock = threading.Lock()
+
+def get_csv_snapshot_cache_stats() -> dict:
+    with _csv_snapshot_cache_lock:
+        return {**_csv_snapshot_cache_stats, "entries": len(_csv_snapshot_cache),
+                "bytes": _csv_snapshot_cache_bytes, "max_bytes": CSV_CACHE_MAX_BYTES}
+
+def invalidate_csv_snapshot(path: str):
+    """Drops every cached snapshot of a CSV file (any version, any column projection)."""
+    global _csv_snapshot_cache_bytes
+    abs_path = os.path.abspath(path)
+    with _csv_snapshot_cache_lock:
+        for key in [k for k in _csv_snapshot_cache if k[0] == abs_path]:
+            _csv_snapshot_cache_bytes -= _csv_snapshot_cache.pop(key)[1]
+
+def _evict_csv_snapshots_locked():
+    global _csv_snapshot_cache_bytes
+    while _csv_snapshot_cache and _csv_snapshot_cache_bytes > CSV_CACHE_MAX_BYTES:
+        _, (_, nbytes) = _csv_snapshot_cache.popitem(last=False)
+        _csv_snapshot_cache_bytes -= nbytes
+        _csv_snapshot_cache_stats["evictions"] += 1
+
+# --- Presorted snapshot views ---
+# Frames from load_data_from_csv carry DATE_SORTED_ATTR: 'date' is datetime64 and ascending. They are shared and
+# read-only, so parse_anomaly_condition skips its copy/convert/sort for them, and a single-service check reads a
+# filtered view built once per snapshot (and dropped with it) instead of rescanning service_name every run.
+DATE_SORTED_ATTR = "finops_date_sorted"
+_snapshot_service_views = {} # id(snapshot) -> {service (lowercased): filtered DataFrame}
+_snapshot_service_views_lock = threading.Lock()
+
+def snapshot_service_view(snapshot: pd.DataFrame, service: str) -> pd.DataFrame:
+    service = service.lower()
+    with _snapshot_service_views_lock:
+        views = _snapshot_service_views.get(id(snapshot))
+        if views is None:
+            views = _snapshot_service_views[id(snapshot)] = {}
+            weakref.finalize(snapshot, _drop_snapshot_service_views, id(snapshot), views)
+        view = views.get(service)
+    if view is None:
+        view = snapshot[snapshot['service_name'].str.lower() == service]
+        with _snapshot_service_views_lock:
+            view = views.setdefault(service, view)
+    return view
+
+def _drop_snapshot_service_views(snapshot_id: int, views: dict):
+    with _snapshot_service_views_lock:
+        if _snapshot_service_views.get(snapshot_id) is views: # The id may already belong to a newer snapshot
+            del _snapshot_service_views[snapshot_id]
+
+# --- Columnar snapshots ---
+# With pyarrow installed, each CSV source is converted (streamed, batch by batch) into an uncompressed Arrow IPC
+# file under SNAPSHOT_DIR. Loads memory-map the snapshot and materialize only the columns a rule needs.
+# A JSON sidecar records the source file's mtime/size so a changed CSV triggers a rebuild. Integer-looking columns
+# are read as float64, since pyarrow infers types from the first block only and costs often gain decimals later.
+# A build that still fails is remembered for that version of the file, so loads go straight to pandas.
+SNAPSHOT_DIR = os.getenv("FINOPS_SNAPSHOT_DIR", "snapshots")
+_snapshot_build_locks = {} # snapshot path -> lock; builds of different sources run concurrently
+_snapshot_build_locks_guard = threading.Lock()
+_snapshot_build_failures = {} # snapshot path -> (mtime_ns, size) of the source version that failed to convert
+
+def _columnar_snapshot_path(csv_path: str) -> str:
+    name = hashlib.sha1(os.path.abspath(csv_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f"{name}.arrow")
+
+def _columnar_snapshot_is_current(snapshot_path: str, file_stat) -> bool:
+    try:
+        with open(snapshot_path + ".json") as f:
+            meta = json.load(f)
+        return os.path.exists(snapshot_path) and meta.get("mtime_ns") == file_stat.st_mtime_ns and meta.get("size") == file_stat.st_size
+    except (OSError, ValueError):
+        return False
+
+def _open_csv_with_float_numbers(csv_path: str):
+    inferred = pa_csv.open_csv(csv_path).schema # Inferred from the first block only
+    column_types = {field.name: pa.float64() for field in inferred if pa.types.is_integer(field.type)}
+    return pa_csv.open_csv(csv_path, convert_options=pa_csv.ConvertOptions(column_types=column_types))
+
+def build_columnar_snapshot(csv_path: str):
+    """Writes (or refreshes) the Arrow snapshot for a CSV file. Returns the snapshot path, or None without pyarrow
+    or if this version of the file already failed to convert."""
+    if pa is None:
+        return None
+    file_stat = os.stat(csv_path)
+    snapshot_path = _columnar_snapshot_path(csv_path)
+    with _snapshot_build_locks_guard:
+        build_lock = _snapshot_build_locks.setdefault(snapshot_path, threading.Lock())
+    with build_lock:
+        if _columnar_snapshot_is_current(snapshot_path, file_stat):
+            return snapshot_path
+        source_version = (file_stat.st_mtime_ns, file_stat.st_size)
+        if _snapshot_build_failures.get(snapshot_path) == source_version:
+            return None
+        print(f"Executor: Building columnar snapshot for {csv_path} -> {snapshot_path}")
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        tmp_path = snapshot_path + ".tmp"
+        try:
+            reader = _open_csv_with_float_numbers(csv_path)
+            if 'date' not in reader.schema.names:
+                raise ValueError(f"CSV '{csv_path}' must contain a 'date' column.")
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            os.replace(tmp_path, snapshot_path)
+        except Exception:
+            _snapshot_build_failures[snapshot_path] = source_version
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise
+        _snapshot_build_failures.pop(snapshot_path, None)
+        with open(snapshot_path + ".json", "w") as f:
+            json.dump({"source_path": os.path.abspath(csv_path), "mtime_ns": file_stat.st_mtime_ns, "size": file_stat.st_size}, f)
+    return snapshot_path
+
+def _read_columnar_snapshot(snapshot_path: str, columns: list = None):
+    with pa.memory_map(snapshot_path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+        if columns:
+            table = table.select([c for c in table.column_names if c in columns])
+        return table.to_pandas()
+
+def _parse_csv(path: str, columns: list = None):
+    df = None
+    if pa is not None:
+        try:
+            snapshot_path = build_columnar_snapshot(path)
+            if snapshot_path is not None:
+                df = _read_columnar_snapshot(snapshot_path, columns)
+        except Exception as e:
+            print(f"Executor: Columnar snapshot unavailable for {path} ({type(e).__name__} - {e}). Parsing CSV directly.")
+    if df is None:
+        df = pd.read_csv(path, usecols=(lambda c: c in columns) if columns else None)
+    if 'date' not in df.columns: raise ValueError(f"CSV '{path}' must contain a 'date' column.")
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values(by='date').reset_index(drop=True)
+    df.attrs[DATE_SORTED_ATTR] = True
+    return df
+
+def load_data_from_csv(config: dict, columns: list = None):
+    global _csv_snapshot_cache_bytes
     path = config.get("path", "sample_data.csv")
-    print(f"Executor: Loading data from CSV: {path}")
     try:
-        df = pd.read_csv(path)
-        if 'date' not in df.columns: raise ValueError(f"CSV '{path}' must contain a 'date' column.")
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values(by='date').reset_index(drop=True)
+        file_stat = os.stat(path)
+        cache_key = (os.path.abspath(path), file_stat.st_mtime_ns, file_stat.st_size, tuple(sorted(columns)) if columns else None)
+        with _csv_snapshot_cache_lock:
+            cached = _csv_snapshot_cache.get(cache_key)
+            if cached is not None:
+                _csv_snapshot_cache.move_to_end(cache_key)
+                _csv_snapshot_cache_stats["hits"] += 1
+                print(f"Executor: CSV snapshot cache hit for {path}")
+                return cached[0]
+            _csv_snapshot_cache_stats["misses"] += 1
+
+        print(f"Executor: Loading data from CSV: {path} (columns: {columns or 'all'})")
+        df = _parse_csv(path, columns)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with _csv_snapshot_cache_lock:
+            # Drop snapshots of older versions of this file before caching the new one
+            for stale_key in [k for k in _csv_snapshot_cache if k[0] == cache_key[0] and k[1:3] != cache_key[1:3]]:
+                _csv_snapshot_cache_bytes -= _csv_snapshot_cache.pop(stale_key)[1]
+            if cache_key not in _csv_snapshot_cache and nbytes <= CSV_CACHE_MAX_BYTES:
+                _csv_snapshot_cache[cache_key] = (df, nbytes)
+                _csv_snapshot_cache_bytes += nbytes
+                _evict_csv_snapshots_locked()
         return df
     except FileNotFoundError: print(f"Executor: CSV file not found at {path}"); raise 
     except Exception as e: print(f"Executor: Error loading CSV {path}: {e}"); raise
@@ -204,30 +564,161 @@ def fetch_mock_kibana_data(config: dict): print(f"Executor: Fetching MOCK Kibana
 def fetch_mock_splunk_data(config: dict): print(f"Executor: Fetching MOCK Splunk data. Config: {config}"); return generate_mock_dataframe(days=7, service_prefix="SPLUNK_EVT", base_cost=3, cost_trend=1.03, cost_noise=0.3, units_base=500, units_trend=1.15, units_noise=100, historical_spike_day_offset=-1, historical_spike_multiplier=2.2)
 
 
+def fetch_data_for_source(ds_type: str, ds_config: dict, columns: list = None):
+    if ds_type == "CSV": return load_data_from_csv(ds_config, columns)
+    elif ds_type == "AWS_COST_EXPLORER_MOCK": return fetch_mock_aws_cost_explorer_data(ds_config)
+    elif ds_type == "KUBERNETES_METRICS_MOCK": return fetch_mock_k8s_cluster_data(ds_config)
+    elif ds_type == "AZURE_COST_MGMT_MOCK": return fetch_mock_azure_cost_mgmt_data(ds_config)
+    elif ds_type == "GCP_BILLING_MOCK": return fetch_mock_gcp_billing_data(ds_config)
+    elif ds_type == "DATADOG_LOGS_MOCK": return fetch_mock_datadog_logs_data(ds_config)
+    elif ds_type == "SHAREPOINT_MOCK": return fetch_mock_sharepoint_data(ds_config)
+    elif ds_type == "KIBANA_MOCK": return fetch_mock_kibana_data(ds_config)
+    elif ds_type == "SPLUNK_MOCK": return fetch_mock_splunk_data(ds_config)
+    else: raise NotImplementedError(f"Data source type '{ds_type}' processing not implemented.")
+
+# --- Fetch coalescing ---
+# Checks on the same data source that fire in the same minute share one in-flight fetch and one DataFrame.
+# parse_anomaly_condition never mutates its input (it copies frames that are not presorted snapshots), so the shared DataFrame is safe.
+FETCH_COALESCE_WAIT_SECONDS = 120
+_coalesced_fetches = {} # (data_source_id, columns) -> {"tick", "config_key", "done" (Event), "df", "error"}
+_coalesced_fetches_lock = threading.Lock()
+
+def fetch_data_coalesced(data_source_id: str, ds_type: str, ds_config: dict, columns: list = None):
+    tick = datetime.now().replace(second=0, microsecond=0)
+    # Only CSV sources honour column projection, so mock sources share one fetch regardless of the rule
+    fetch_key = (data_source_id, tuple(sorted(columns)) if columns and ds_type == "CSV" else None)
+    config_key = (ds_type, json.dumps(ds_config, sort_keys=True, default=str))
+    with _coalesced_fetches_lock:
+        entry = _coalesced_fetches.get(fetch_key)
+        is_owner = not entry or entry["tick"] != tick or entry["config_key"] != config_key
+        if is_owner:
+            entry = {"tick": tick, "config_key": config_key, "done": threading.Event(), "df": None, "error": None}
+            _coalesced_fetches[fetch_key] = entry
+
+    if is_owner:
+        try:
+            entry["df"] = fetch_data_for_source(ds_type, ds_config, columns)
+        except Exception as e:
+            entry["error"] = e
+        finally:
+            entry["done"].set()
+    elif entry["done"].wait(timeout=FETCH_COALESCE_WAIT_SECONDS):
+        print(f"Executor: Reusing coalesced fetch for DS {data_source_id} (tick {tick:%H:%M}).")
+    else:
+        print(f"Executor: Coalesced fetch for DS {data_source_id} timed out after {FETCH_COALESCE_WAIT_SECONDS}s. Fetching directly.")
+        return fetch_data_for_source(ds_type, ds_config, columns)
+
+    if entry["error"] is not None:
+        raise entry["error"]
+    return entry["df"]
+
+
+# --- Alert deduplication and flap suppression ---
+# Alerts belong to incidents keyed on (check, service, condition). The first breach opens one alert row and
+# notifies; repeats while it is open only bump that row's occurrence_count/last_seen, re-notifying (live event,
+# marked unread) at most every ALERT_RENOTIFY_SECONDS. A run that evaluates cleanly resolves the check's other open
+# incidents, except flapping ones: ALERT_FLAP_THRESHOLD or more open/resolve transitions within
+# ALERT_FLAP_WINDOW_SECONDS hold an incident open until it has been stable for the window. Incident state is
+# per process (a check always runs on the same worker) and is rebuilt from its open alert rows on its first run.
+ALERT_RENOTIFY_SECONDS = float(os.getenv("FINOPS_ALERT_RENOTIFY_SECONDS", "3600"))
+ALERT_FLAP_WINDOW_SECONDS = float(os.getenv("FINOPS_ALERT_FLAP_WINDOW_SECONDS", "3600"))
+ALERT_FLAP_THRESHOLD = int(os.getenv("FINOPS_ALERT_FLAP_THRESHOLD", "3"))
+_incident_states = {} # check_id -> {dedup_key: {"open", "last_notified", "occurrences", "transitions"}}
+_incident_states_lock = threading.Lock()
+
+def alert_dedup_key(check_id: str, service: str, condition: str) -> str:
+    return hashlib.sha1(f"{check_id}\n{(service or 'overall').lower()}\n{condition}".encode('utf-8')).hexdigest()
+
+def _new_incident() -> dict:
+    return {"open": False, "last_notified": None, "occurrences": 0, "transitions": deque()}
+
+def _load_incidents(check_id: str, tenant_id: str, now: datetime) -> dict:
+    incidents = {}
+    for row in get_open_alerts_for_check(check_id, tenant_id):
+        incident = _new_incident()
+        last_notified = row['last_notified_at'] or row['alert_time']
+        incident.update(open=True, occurrences=row['occurrence_count'],
+                        last_notified=datetime.fromisoformat(last_notified) if isinstance(last_notified, str) else last_notified)
+        if row['is_flapping']: # Flap history isn't persisted; keep it flapping for another window
+            incident["transitions"].extend([now] * ALERT_FLAP_THRESHOLD)
+        incidents[row['dedup_key']] = incident
+    return incidents
+
+def _is_flapping(incident: dict, now: datetime) -> bool:
+    transitions = incident["transitions"]
+    while transitions and (now - transitions[0]).total_seconds() > ALERT_FLAP_WINDOW_SECONDS:
+        transitions.popleft()
+    return len(transitions) >= ALERT_FLAP_THRESHOLD
+
+def observe_alerts(check_id: str, tenant_id: str, breaches: dict, evaluated: bool):
+    """Applies one run's result to the check's incidents. breaches maps dedup_key -> (message, details) for every
+    alert condition the run raised; evaluated is False when the run couldn't evaluate its condition, in which
+    case open incidents are left as they are."""
+    now = datetime.now()
+    notifications = []
+    with _incident_states_lock:
+        incidents = _incident_states.get(check_id)
+        if incidents is None:
+            incidents = _incident_states[check_id] = _load_incidents(check_id, tenant_id, now)
+        for dedup_key, (message, details) in breaches.items():
+            incident = incidents.setdefault(dedup_key, _new_incident())
+            if incident["open"]:
+                incident["occurrences"] += 1
+                renotify = (now - incident["last_notified"]).total_seconds() >= ALERT_RENOTIFY_SECONDS
+                if renotify: incident["last_notified"] = now
+                queue_alert_occurrence(dedup_key, tenant_id, message, details, _is_flapping(incident, now), now if renotify else None)
+            else:
+                incident.update(open=True, last_notified=now, occurrences=1)
+                incident["transitions"].append(now)
+                queue_alert(check_id, message, tenant_id, details, dedup_key=dedup_key, is_flapping=_is_flapping(incident, now))
+                renotify = True
+            if renotify:
+                notifications.append({"check_id": check_id, "alert_time": now.isoformat(sep=" "), "message": message,
+                                      "details": details, "is_read": 0, "dedup_key": dedup_key,
+                                      "occurrence_count": incident["occurrences"], "is_flapping": _is_flapping(incident, now)})
+        if evaluated:
+            for dedup_key, incident in list(incidents.items()):
+                if dedup_key in breaches:
+                    continue
+                if incident["open"] and not _is_flapping(incident, now):
+                    incident["open"] = False
+                    incident["transitions"].append(now)
+                    queue_alert_resolution(dedup_key, tenant_id)
+                if not incident["open"] and not _is_flapping(incident, now) and not incident["transitions"]:
+                    del incidents[dedup_key] # Quiet for a whole window; nothing left to remember
+    for notification in notifications:
+        publish_event(tenant_id, "alert", notification)
+
+def invalidate_incident_state(check_id: str):
+    with _incident_states_lock:
+        _incident_states.pop(check_id, None)
+
 def execute_check(check_id: str):
     print(f"Executor: Executing check ID: {check_id} at {datetime.now()}")
-    # <<< Fetch check_details along with tenant_id for add_alert_to_db >>>
+    # <<< Fetch check_details along with tenant_id for queue_alert >>>
     # Assuming get_check_from_db returns a dictionary or Row that includes tenant_id
     check_details_row = get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass default tenant for now
 
     if not check_details_row:
         msg = f"Error! Check ID {check_id} not found in database (for default tenant)."
         print(f"Executor: {msg}")
-        # Cannot call add_alert_to_db if check_details (and thus tenant_id) is not found
+        # Cannot call queue_alert if check_details (and thus tenant_id) is not found
         return
 
     check_details = dict(check_details_row)
-    # <<< Extract tenant_id from check_details for use with add_alert_to_db >>>
+    # <<< Extract tenant_id from check_details for use with queue_alert >>>
     tenant_id_for_alert = check_details.get("tenant_id", DEFAULT_TENANT_ID) 
     data_source_id = check_details.get("data_source_id")
     # ... (rest of the variable assignments from check_details)
     anomaly_condition_str = check_details.get("anomaly_condition_raw", "")
+    anomaly_rule = get_compiled_rule(check_id, anomaly_condition_str, check_details.get("anomaly_rule"))
     explicit_target_service = check_details.get("target_service") 
     suggestion = check_details.get("suggestion", "N/A.")
     natural_query = check_details.get("natural_query", "N/A")
     run_status = "failure_execution_initial"
     df = None
     data_source_name_for_alert = "Unknown Data Source"
+    breaches, evaluated = {}, False # Alert conditions raised by this run, and whether the condition was evaluated
 
 
     try:
@@ -246,33 +737,32 @@ def execute_check(check_id: str):
 
         print(f"Executor: Check {check_id} using DS '{data_source_name_for_alert}' (Type: {ds_type}) Config: {ds_config}")
 
-        if ds_type == "CSV": df = load_data_from_csv(ds_config)
-        elif ds_type == "AWS_COST_EXPLORER_MOCK": df = fetch_mock_aws_cost_explorer_data(ds_config)
-        elif ds_type == "KUBERNETES_METRICS_MOCK": df = fetch_mock_k8s_cluster_data(ds_config)
-        elif ds_type == "AZURE_COST_MGMT_MOCK": df = fetch_mock_azure_cost_mgmt_data(ds_config)
-        elif ds_type == "GCP_BILLING_MOCK": df = fetch_mock_gcp_billing_data(ds_config)
-        elif ds_type == "DATADOG_LOGS_MOCK": df = fetch_mock_datadog_logs_data(ds_config)
-        elif ds_type == "SHAREPOINT_MOCK": df = fetch_mock_sharepoint_data(ds_config)
-        elif ds_type == "KIBANA_MOCK": df = fetch_mock_kibana_data(ds_config)
-        elif ds_type == "SPLUNK_MOCK": df = fetch_mock_splunk_data(ds_config)
-        else: raise NotImplementedError(f"Data source type '{ds_type}' processing not implemented.")
+        df = fetch_data_coalesced(data_source_id, ds_type, ds_config, rule_columns(anomaly_rule))
 
         if df is None or df.empty:
             raise ValueError(f"No data from DS type '{ds_type}'.")
 
         anomalies_found_series = parse_anomaly_condition(
             condition_str=anomaly_condition_str, data_df=df,
-            local_service_filter=explicit_target_service
+            local_service_filter=explicit_target_service, rule=anomaly_rule,
+            rolling_state_key=(check_id, (explicit_target_service or 'overall').lower())
         )
         
-        if not anomalies_found_series.empty and anomalies_found_series.any():
+        if is_all_services_target(explicit_target_service) and not anomalies_found_series.empty and anomalies_found_series.any():
+            # Series is indexed by service_name in all-services mode; raise one alert per breaching service
+            for breaching_service in anomalies_found_series[anomalies_found_series].index:
+                alert_message = (f"ALERT for Check '{natural_query}' (DS: {data_source_name_for_alert}, Svc: {breaching_service}): Anomaly on condition '{anomaly_condition_str}'. Suggestion: {suggestion}")
+                print(f"Executor: {alert_message}")
+                breaches[alert_dedup_key(check_id, breaching_service, anomaly_condition_str)] = (alert_message, None)
+            run_status, evaluated = "anomaly_detected", True
+        elif not anomalies_found_series.empty and anomalies_found_series.any():
             alert_message = (f"ALERT for Check '{natural_query}' (DS: {data_source_name_for_alert}, Svc: {explicit_target_service or 'Overall'}): Anomaly on condition '{anomaly_condition_str}'. Suggestion: {suggestion}")
             print(f"Executor: {alert_message}")
-            add_alert_to_db(check_id=check_id, message=alert_message, tenant_id=tenant_id_for_alert) # Pass tenant_id
-            run_status = "anomaly_detected"
+            breaches[alert_dedup_key(check_id, explicit_target_service, anomaly_condition_str)] = (alert_message, None)
+            run_status, evaluated = "anomaly_detected", True
         elif not anomalies_found_series.empty:
             print(f"Executor: No anomalies for {check_id} (DS: {data_source_name_for_alert}, Svc: {explicit_target_service or 'Overall'})")
-            run_status = "no_anomaly"
+            run_status, evaluated = "no_anomaly", True
         else: 
             print(f"Executor: Anomaly check for {check_id} (DS: {data_source_name_for_alert}, Svc: {explicit_target_service or 'Overall'}) had no result.")
             run_status = "failure_condition_processing"
@@ -280,15 +770,19 @@ def execute_check(check_id: str):
     except (FileNotFoundError, ValueError, NotImplementedError) as specific_error:
         err_msg = f"Data/Config error for {check_id} (DS: {data_source_name_for_alert}): {type(specific_error).__name__} - {specific_error}"
         print(f"Executor: {err_msg}")
-        add_alert_to_db(check_id=check_id, message=f"Exec Error for '{natural_query}': {err_msg}", tenant_id=tenant_id_for_alert) # Pass tenant_id
+        breaches[alert_dedup_key(check_id, "error", type(specific_error).__name__)] = (f"Exec Error for '{natural_query}': {err_msg}", None)
         run_status = f"failure_data_error: {str(specific_error)[:100]}"
     except Exception as e:
         err_msg = f"General error executing {check_id}: {type(e).__name__} - {e}"
         print(f"Executor: {err_msg}")
-        add_alert_to_db(check_id=check_id, message=f"Exec Error for '{natural_query}': {err_msg}", details=str(e), tenant_id=tenant_id_for_alert) # Pass tenant_id
+        breaches[alert_dedup_key(check_id, "error", type(e).__name__)] = (f"Exec Error for '{natural_query}': {err_msg}", str(e))
         run_status = f"failure_execution: {type(e).__name__} - {str(e)[:100]}"
     
-    update_check_execution_outcome(check_id, datetime.now(), run_status)
+    observe_alerts(check_id, tenant_id_for_alert, breaches, evaluated)
+    last_run_at = datetime.now()
+    queue_check_execution_outcome(check_id, last_run_at, run_status)
+    publish_event(tenant_id_for_alert, "check_run", {"check_id": check_id, "last_run_at": last_run_at.isoformat(sep=" "),
+                                                     "last_run_status": run_status})
 
 if __name__ == '__main__':
     pass
\ No newline at end of file
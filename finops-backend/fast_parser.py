@@ -0,0 +1,203 @@
+# fast_parser.py
+# Deterministic rule-based parser for the common query shapes ("every minute", "every weekday at 2 AM",
+# "exceeds $70", "25% above the 7-day average"). It produces the same JSON shape as the LLM parse plus a
+# confidence score; parse_query_endpoint only falls back to the LLM when the confidence is below
+# FAST_PARSE_MIN_CONFIDENCE. Every result it returns has a cron string CronTrigger.from_crontab accepts and a
+# condition executor.compile_anomaly_condition compiles.
+import os
+import re
+
+from apscheduler.triggers.cron import CronTrigger
+
+from executor import compile_anomaly_condition, ALL_SERVICES_TARGETS
+from parse_cache import SERVICE_ID_PATTERN, NON_SERVICE_TARGETS, known_services_snapshot
+
+FAST_PARSE_MIN_CONFIDENCE = float(os.getenv("FINOPS_FAST_PARSE_MIN_CONFIDENCE", "0.85"))
+
+NUMBER = r"\d+(?:,\d{3})*(?:\.\d+)?"
+# Day names, not numbers: APScheduler counts day_of_week from 0 = Monday, unlike standard cron's 0 = Sunday
+DAY_OF_WEEK = {"sunday": "sun", "monday": "mon", "tuesday": "tue", "wednesday": "wed", "thursday": "thu", "friday": "fri", "saturday": "sat"}
+GREATER_KEYWORDS = r"exceeds?|is greater than|greater than|is more than|more than|goes above|is above|above|is over|over|higher than|surpass(?:es)?|>"
+LESS_KEYWORDS = r"drops below|falls below|is below|below|is less than|less than|under|lower than|<"
+SUGGESTION_PATTERN = re.compile(r"[,.;]?\s*\b(?:please\s+)?(suggest|recommend|flag for|flag|alert for|alert(?!\s+(?:if|when|me)\b)|notify(?!\s+(?:if|when|me)\b))\b(.*)$", re.IGNORECASE | re.DOTALL)
+# Capitalized tokens that are not service names
+NON_SERVICE_TOKENS = {"AM", "PM", "UTC", "GMT", "USD", "IF", "I", "A", "AN", "THE", "CPU", "RAM"}
+# "is not above", "no more than", "doesn't exceed": the rules only model plain comparisons, so negated ones go to the LLM
+NEGATION_PATTERN = re.compile(r"\b(?:not|never|no)\b|n't\b")
+UNSUPPORTED_METRIC_WORDS = re.compile(r"\b(cpu|memory|utili[sz]ation|latency|errors?|requests?|bandwidth usage|throughput)\b")
+
+def _parse_time_of_day(text: str):
+    """Returns ((hour, minute), span) for '2 AM', '2:30 pm', 'at 14:00', 'midnight', 'noon'; or (None, None)."""
+    match = re.search(r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b", text)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        if not 1 <= hour <= 12 or minute > 59:
+            return None, None
+        hour = hour % 12 + (12 if match.group(3) == "pm" else 0)
+        return (hour, minute), match.span()
+    match = re.search(r"\bat\s+(\d{1,2}):(\d{2})\b", text)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour > 23 or minute > 59:
+            return None, None
+        return (hour, minute), match.span()
+    match = re.search(r"\b(?:at\s+)?(midnight|noon)\b", text)
+    if match:
+        return ((0, 0) if match.group(1) == "midnight" else (12, 0)), match.span()
+    return None, None
+
+def parse_schedule(text: str):
+    """Returns (cron_string, [consumed spans]) or (None, [])."""
+    match = re.search(r"\bevery\s+(\d+)\s+minutes?\b", text)
+    if match:
+        return f"*/{int(match.group(1))} * * * *", [match.span()]
+    match = re.search(r"\b(?:every|each|per)\s+minute\b|\bminutely\b", text)
+    if match:
+        return "* * * * *", [match.span()]
+    match = re.search(r"\bevery\s+(\d+)\s+hours?\b", text)
+    if match:
+        return f"0 */{int(match.group(1))} * * *", [match.span()]
+    match = re.search(r"\b(?:every|each|per)\s+hour\b|\bhourly\b", text)
+    if match:
+        return "0 * * * *", [match.span()]
+
+    day_of_week, day_of_month = None, "*"
+    day_match = re.search(r"\b(?:every|each|on)\s+weekdays?\b|\bweekdays\b", text)
+    if day_match:
+        day_of_week = "mon-fri"
+    if not day_match:
+        day_match = re.search(r"\b(?:every|each|on)\s+weekends?\b|\bweekends\b", text)
+        if day_match: day_of_week = "sat,sun"
+    if not day_match:
+        day_match = re.search(r"\b(?:every|each|on)\s+(" + "|".join(DAY_OF_WEEK) + r")s?\b", text)
+        if day_match: day_of_week = DAY_OF_WEEK[day_match.group(1)]
+    if not day_match:
+        day_match = re.search(r"\b(?:every|each)\s+day\b|\bdaily\b|\bevery\s+night\b|\bnightly\b", text)
+        if day_match: day_of_week = "*"
+    if not day_match:
+        day_match = re.search(r"\b(?:every|each)\s+week\b|\bweekly\b", text)
+        if day_match: day_of_week = "mon"
+    if not day_match:
+        day_match = re.search(r"\b(?:every|each)\s+month\b|\bmonthly\b", text)
+        if day_match: day_of_week, day_of_month = "*", "1"
+    if not day_match:
+        return None, []
+
+    spans = [day_match.span()]
+    time_of_day, time_span = _parse_time_of_day(text)
+    hour, minute = time_of_day or (0, 0)
+    if time_span:
+        spans.append(time_span)
+    return f"{minute} {hour} {day_of_month} * {day_of_week}", spans
+
+def parse_condition(text: str, context: str = ""):
+    """Returns (condition_string, [consumed spans], penalty) for the condition clause text, or (None, [], 0).
+
+    context is the query text before the clause ("Check EC2 spend ... if it exceeds $X"), used to name the metric.
+    """
+    penalty = 0.0
+    pct_match = re.search(r"(\d+(?:\.\d+)?)\s*%\s+(?:above|over|higher than)\s+(?:the\s+|its\s+)?(?:(\d+)[-\s]day|(weekly|daily))\s+(?:moving\s+|rolling\s+)?average", text)
+    if pct_match:
+        window = pct_match.group(2) or ("7" if pct_match.group(3) == "weekly" else "1")
+        return f"cost is more than {pct_match.group(1)}% above the {int(window)}-day average", [pct_match.span()], penalty
+
+    comparisons = []
+    for symbol, keywords in (('>', GREATER_KEYWORDS), ('<', LESS_KEYWORDS)):
+        for match in re.finditer(rf"(?<![\w])({keywords})\s*\$?\s?({NUMBER})(?!\d|\.\d)(?!\s*%)", text):
+            comparisons.append((match.start(), symbol, match))
+    if not comparisons:
+        return None, [], 0.0
+    if len(comparisons) > 1:
+        penalty += 0.6 # Compound conditions ("above $X and below $Y") are left to the LLM
+    _, symbol, match = min(comparisons, key=lambda c: c[0])
+    value = match.group(2).replace(",", "")
+
+    clause_before = text[:match.start()]
+    if re.search(r"\bunits?\b", clause_before):
+        metric = "units"
+    else:
+        metric = "cost"
+        if not re.search(r"\b(cost|costs|spend|spending|bill|billing|charges?)\b", context + " " + clause_before):
+            penalty += 0.2
+    if UNSUPPORTED_METRIC_WORDS.search(clause_before):
+        penalty += 0.5
+    if NEGATION_PATTERN.search(text[:match.start(2)]):
+        penalty += 0.6
+    return f"{metric} {symbol} {value}", [match.span()], penalty
+
+def parse_target_service(query: str):
+    """Returns (target_service, span in the query) or ("Overall", None)."""
+    lower = query.lower()
+    for phrase in sorted(ALL_SERVICES_TARGETS - {'*', 'all', 'any'}, key=len, reverse=True):
+        match = re.search(rf"\b{re.escape(phrase)}(?:'s)?\b", lower)
+        if match:
+            return "ALL", match.span()
+    match = re.search(r"\bfor\s+['\"]([^'\"]+)['\"]", query)
+    if match:
+        return match.group(1).strip(), match.span(1)
+    match = re.search(rf"(?<![\w$]){SERVICE_ID_PATTERN}(?!\w)", query)
+    if match:
+        return match.group(0), match.span()
+    for name in known_services_snapshot():
+        match = re.search(rf"(?<![\w]){re.escape(name)}(?!\w)", query, re.IGNORECASE)
+        if match:
+            return match.group(0), match.span()
+    # Bare acronyms ("S3", "EC2"); in a run like "AWS EC2" the last one is the service
+    candidate = None
+    for match in re.finditer(r"(?<![\w'])[A-Z][A-Z0-9]{1,}(?![\w'])", query):
+        if match.group(0) in NON_SERVICE_TOKENS or match.group(0).lower() in NON_SERVICE_TARGETS:
+            continue
+        if candidate and query[candidate.end():match.start()].strip():
+            break
+        candidate = match
+    if candidate:
+        return candidate.group(0), candidate.span()
+    return "Overall", None
+
+def fast_parse(query: str):
+    """Returns (parsed_dict or None, confidence in [0, 1])."""
+    query = " ".join((query or "").split())
+    lower = query.lower()
+
+    suggestion = "N/A"
+    condition_region_end = len(query)
+    suggestion_match = SUGGESTION_PATTERN.search(query)
+    if suggestion_match and suggestion_match.group(2).strip():
+        suggestion = f"{suggestion_match.group(1)} {suggestion_match.group(2).strip().rstrip('.')}".strip()
+        suggestion = suggestion[0].upper() + suggestion[1:] + "."
+        condition_region_end = suggestion_match.start()
+
+    schedule, consumed = parse_schedule(lower[:condition_region_end])
+    if not schedule:
+        return None, 0.0
+
+    if_match = re.search(r"\b(?:if|when)\b", lower[:condition_region_end])
+    condition_start = if_match.end() if if_match else 0
+    condition, condition_spans, penalty = parse_condition(lower[condition_start:condition_region_end], lower[:condition_start])
+    if not condition:
+        return None, 0.0
+    consumed += [(start + condition_start, end + condition_start) for start, end in condition_spans]
+
+    target_service, service_span = parse_target_service(query[:condition_region_end])
+    if service_span:
+        consumed.append(service_span)
+
+    confidence = 1.0 - penalty
+    if suggestion == "N/A":
+        confidence -= 0.1
+    # Any number we didn't account for means the query says something the rules don't model
+    for number in re.finditer(rf"(?<![\w.,]){NUMBER}(?![\w])", lower[:condition_region_end]):
+        if not any(start <= number.start() < end for start, end in consumed):
+            confidence -= 0.5
+            break
+
+    try:
+        CronTrigger.from_crontab(schedule)
+    except ValueError:
+        return None, 0.0
+    if compile_anomaly_condition(condition).get("type") not in ("percentage_average", "fixed_threshold"):
+        return None, 0.0
+
+    parsed_data = {"scheduleString": schedule, "anomalyCondition": condition,
+                   "targetService": target_service, "actionableSuggestion": suggestion}
+    return parsed_data, max(0.0, min(1.0, confidence))
@@ -0,0 +1,180 @@
+# job_store.py
+# APScheduler job store kept in the app's own SQLite database (same pooled WAL connections as database.py),
+# so scheduled jobs and their next fire times survive restarts. Alongside the pickled job state it records a
+# fingerprint of the job's trigger; startup reconciliation compares fingerprints with the checks table
+# without unpickling every job, and only reschedules checks that were added, changed or removed.
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database import get_db_connection, release_db_connection
+
+# Inside batch(), writes commit every JOB_STORE_BATCH_COMMIT_ROWS rows instead of per job. The batch stays
+# short enough that the event loop's own job-store writes are never starved of the write lock.
+JOB_STORE_BATCH_COMMIT_ROWS = int(os.getenv("FINOPS_JOB_STORE_BATCH_COMMIT_ROWS", "5000"))
+
+def job_fingerprint(trigger) -> str:
+    """What reconciliation compares: the trigger's fields (schedule and load-shaping offset)."""
+    return str(trigger)
+
+class SQLiteJobStore(BaseJobStore):
+    """Mirrors apscheduler's SQLAlchemyJobStore on the apscheduler_jobs table created by migration 5."""
+
+    def __init__(self, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+        self._batch_state = threading.local()
+
+    @contextmanager
+    def batch(self):
+        """Groups this thread's add/update/remove_job writes into transactions of JOB_STORE_BATCH_COMMIT_ROWS."""
+        self._batch_state.pending = 0
+        self._batch_state.fingerprints = {} # id(trigger) -> (trigger, fingerprint) for triggers shared across jobs
+        self._batch_state.active = True
+        try:
+            yield self
+        finally:
+            self._batch_state.active = False
+            self._batch_state.fingerprints = None
+            get_db_connection().commit()
+
+    def _fingerprint(self, trigger) -> str:
+        cache = getattr(self._batch_state, "fingerprints", None) if getattr(self._batch_state, "active", False) else None
+        if cache is None:
+            return job_fingerprint(trigger)
+        cached = cache.get(id(trigger))
+        if cached is None: # The trigger is kept alive in the entry, so its id can't be reused mid-batch
+            cached = cache[id(trigger)] = (trigger, job_fingerprint(trigger))
+        return cached[1]
+
+    def _commit(self, conn):
+        if not getattr(self._batch_state, "active", False):
+            conn.commit()
+            return
+        self._batch_state.pending += 1
+        if self._batch_state.pending >= JOB_STORE_BATCH_COMMIT_ROWS:
+            conn.commit()
+            self._batch_state.pending = 0
+
+    def _release(self, conn):
+        if not getattr(self._batch_state, "active", False):
+            release_db_connection(conn) # Inside a batch the open transaction must survive until _commit
+
+    def lookup_job(self, job_id):
+        conn = get_db_connection()
+        try:
+            row = conn.execute("SELECT job_state FROM apscheduler_jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._reconstitute_job(row['job_state']) if row else None
+        finally:
+            release_db_connection(conn)
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        conn = get_db_connection()
+        try:
+            row = conn.execute("SELECT next_run_time FROM apscheduler_jobs WHERE next_run_time IS NOT NULL ORDER BY next_run_time LIMIT 1").fetchone()
+            return utc_timestamp_to_datetime(row['next_run_time']) if row else None
+        finally:
+            release_db_connection(conn)
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def get_job_fingerprints(self) -> dict:
+        """{job_id: (fingerprint, next_run_time epoch seconds)} without unpickling any job."""
+        conn = get_db_connection()
+        try:
+            return {row['id']: (row['fingerprint'], row['next_run_time'])
+                    for row in conn.execute("SELECT id, fingerprint, next_run_time FROM apscheduler_jobs").fetchall()}
+        finally:
+            release_db_connection(conn)
+
+    def add_job(self, job):
+        conn = get_db_connection()
+        try:
+            conn.execute("INSERT INTO apscheduler_jobs (id, next_run_time, job_state, fingerprint) VALUES (?, ?, ?, ?)",
+                         (job.id, datetime_to_utc_timestamp(job.next_run_time),
+                          pickle.dumps(job.__getstate__(), self.pickle_protocol), self._fingerprint(job.trigger)))
+            self._commit(conn)
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+        finally:
+            self._release(conn)
+
+    def update_job(self, job):
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute("UPDATE apscheduler_jobs SET next_run_time = ?, job_state = ?, fingerprint = ? WHERE id = ?",
+                                  (datetime_to_utc_timestamp(job.next_run_time),
+                                   pickle.dumps(job.__getstate__(), self.pickle_protocol), self._fingerprint(job.trigger), job.id))
+            self._commit(conn)
+            if cursor.rowcount == 0:
+                raise JobLookupError(job.id)
+        finally:
+            self._release(conn)
+
+    def remove_job(self, job_id):
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute("DELETE FROM apscheduler_jobs WHERE id = ?", (job_id,))
+            self._commit(conn)
+            if cursor.rowcount == 0:
+                raise JobLookupError(job_id)
+        finally:
+            self._release(conn)
+
+    def remove_jobs(self, job_ids):
+        """Bulk delete used by reconciliation; missing ids are ignored."""
+        conn = get_db_connection()
+        try:
+            conn.executemany("DELETE FROM apscheduler_jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
+            conn.commit()
+        finally:
+            release_db_connection(conn)
+
+    def remove_all_jobs(self):
+        conn = get_db_connection()
+        try:
+            conn.execute("DELETE FROM apscheduler_jobs")
+            conn.commit()
+        finally:
+            release_db_connection(conn)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = "", params=()):
+        jobs, failed_job_ids = [], []
+        conn = get_db_connection()
+        try:
+            for row in conn.execute(f"SELECT id, job_state FROM apscheduler_jobs {where} ORDER BY next_run_time", params).fetchall():
+                try:
+                    jobs.append(self._reconstitute_job(row['job_state']))
+                except BaseException:
+                    self._logger.exception('Unable to restore job "%s" -- removing it', row['id'])
+                    failed_job_ids.append(row['id'])
+            if failed_job_ids:
+                conn.executemany("DELETE FROM apscheduler_jobs WHERE id = ?", [(job_id,) for job_id in failed_job_ids])
+                conn.commit()
+            return jobs
+        finally:
+            release_db_connection(conn)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (apscheduler_jobs)>"
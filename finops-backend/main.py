@@ -1,33 +1,59 @@
 # main.py
 import os
 import json
+import asyncio
 import uuid
+import random
+import hashlib
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI, APITimeoutError, APIConnectionError, RateLimitError, InternalServerError
 from dotenv import load_dotenv
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.schedulers.base import STATE_RUNNING, STATE_PAUSED
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.util import utc_timestamp_to_datetime
 
 from database import (
     init_db, add_check_to_db, get_check_from_db,
     # get_all_active_checks_from_db, # We'll use a tenant-specific one for startup loading
     delete_check_from_db,
-    update_check_status_in_db, update_check_run_times_in_db,
-    get_db_connection, get_alerts_from_db, add_alert_to_db, # add_alert_to_db will need tenant_id from executor
+    update_checks_status_many, update_check_run_times_many,
+    get_db_connection, get_alerts_page_from_db, add_alert_to_db, # add_alert_to_db will need tenant_id from executor
     add_data_source, get_data_source_by_id, 
     get_data_source_by_name, get_all_data_sources,
-    delete_data_source_from_db, 
+    delete_data_source_from_db, close_all_db_connections,
+    start_write_behind, stop_write_behind,
     DEFAULT_TENANT_ID, # <<< Import default tenant ID
     get_all_checks_for_tenant_from_db, # <<< Import new function for fetching checks
+    get_checks_page_from_db, decode_page_cursor,
     get_all_active_checks_from_db # Still needed for startup, will pass tenant_id
 )
-from executor import execute_check
+import database_async as adb
+from database_async import run_db, shutdown_db_executor
+from parse_cache import (
+    get_cached_parse, store_parse, get_template_parse, store_template_parse,
+    register_known_services, get_parse_cache_stats
+)
+from fast_parser import fast_parse, FAST_PARSE_MIN_CONFIDENCE
+from execution_backend import run_scheduled_check, start_execution_backend, stop_execution_backend, broadcast_invalidation
+from scheduler_shards import SCHEDULER_MODE, ShardCoordinator, set_shard_coordinator, owns_check, shard_for_check
+from job_store import SQLiteJobStore, job_fingerprint
+from response_cache import get_cached_response, build_cached_response, etag_matches
+from event_hub import publish_event, subscribe_events, unsubscribe_events
+from executor import (
+    execute_check, compile_anomaly_condition, invalidate_compiled_rule, invalidate_rolling_state, invalidate_incident_state,
+    build_columnar_snapshot, invalidate_csv_snapshot, get_csv_snapshot_cache_stats
+)
 
 load_dotenv()
 app = FastAPI(title="FinOps Natural Language Scheduler API (Multi-Tenant Aware)")
@@ -38,103 +64,348 @@ origins = [
 ]
 app.add_middleware(
     CORSMiddleware, allow_origins=origins, allow_credentials=True,
-    allow_methods=["*"], allow_headers=["*"],
+    allow_methods=["*"], allow_headers=["*"], expose_headers=["ETag", "X-Next-Cursor"],
 )
+MAX_PAGE_LIMIT = int(os.getenv("FINOPS_MAX_PAGE_LIMIT", "1000"))
+
+# LLM client settings. OPENAI_BASE_URL (read by the SDK) can point the client at a local stand-in for testing.
+LLM_MODEL = os.getenv("FINOPS_LLM_MODEL", "gpt-3.5-turbo-0125")
+LLM_TIMEOUT_SECONDS = float(os.getenv("FINOPS_LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("FINOPS_LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("FINOPS_LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("FINOPS_LLM_RETRY_BACKOFF_SECONDS", "0.5"))
+LLM_RETRYABLE_ERRORS = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
 
 try:
-    client = OpenAI()
+    # Retries are handled in call_llm_parse so backoff and the concurrency cap are applied together
+    client = AsyncOpenAI(timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY not found in environment variables.")
 except Exception as e:
     print(f"Fatal: Error initializing OpenAI client: {e}")
     client = None
 
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+PARSE_SYSTEM_PROMPT = """
+You are an AI assistant for a FinOps application. Your task is to parse a user's natural language query
+and extract scheduling information, anomaly detection rules, a target service if specified, and rightsizing suggestions.
+Return the output ONLY as a valid JSON object with the keys: "scheduleString", "anomalyCondition", "targetService", "actionableSuggestion".
+
+- "scheduleString": A cron expression (e.g., "0 9 * * 1") or "N/A" if not specified.
+- "anomalyCondition": A concise description of the anomaly trigger (e.g., "cost > 15% above weekly average", "spend exceeds $100"). If a specific resource is identified in "targetService", do NOT repeat it in "anomalyCondition". If not specified, return "N/A".
+- "targetService": Extract the MOST SPECIFIC service name, resource identifier, or entity ID mentioned that the check directly monitors (e.g., "EC2", "S3", "K8S_POD_1", "my-specific-bucket", "AWS_CE_SVC_1"). If the query clearly indicates a check on a general service type (e.g., "overall Kubernetes spend", "all S3 buckets") and no more specific entity is mentioned for the core check, then return the general service type (e.g., "Kubernetes", "S3"). If no specific service is mentioned or it's about overall total costs, return null or "Overall". If the condition applies to each service individually (e.g., "alert if any service's cost exceeds $500"), return "ALL".
+- "actionableSuggestion": The suggested action if an anomaly is detected. If not specified, return "N/A".
+"""
+
+# Cached parses are keyed on this, so editing the prompt or switching models starts a fresh cache
+PARSE_PROMPT_VERSION = hashlib.sha1(f"{LLM_MODEL}\n{PARSE_SYSTEM_PROMPT}".encode('utf-8')).hexdigest()[:12]
+
+async def call_llm_parse(natural_language_query: str) -> dict:
+    """Parses a natural-language query with the LLM. At most LLM_MAX_CONCURRENCY calls are in flight;
+    timeouts, connection errors, rate limits and 5xx responses are retried with exponential backoff."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async with _llm_semaphore:
+                completion = await client.chat.completions.create(
+                    model=LLM_MODEL, response_format={"type": "json_object"},
+                    messages=[
+                        {"role": "system", "content": PARSE_SYSTEM_PROMPT},
+                        {"role": "user", "content": f"User Query: \"{natural_language_query}\""}
+                    ],
+                    temperature=0.1,
+                )
+            break
+        except LLM_RETRYABLE_ERRORS as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = LLM_RETRY_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random())
+            print(f"LLM call failed ({type(e).__name__}), retry {attempt + 1}/{LLM_MAX_RETRIES} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    if hasattr(completion, 'choices'):
+        llm_response_content = completion.choices[0].message.content
+    else:
+        llm_response_content = completion['choices'][0]['message']['content']
+    print(f"LLM Raw Response: {llm_response_content}")
+    return json.loads(llm_response_content)
+
+# /api/parse-query/batch limits
+PARSE_BATCH_CONCURRENCY = int(os.getenv("FINOPS_PARSE_BATCH_CONCURRENCY", "16"))
+PARSE_BATCH_MAX_ITEMS = int(os.getenv("FINOPS_PARSE_BATCH_MAX_ITEMS", "1000"))
+
+# Per-path counters for resolve_query_parse: how each query was answered and how long it took
+PARSE_PATHS = ("fast_path", "cache", "template", "llm")
+_parse_path_stats = {path: {"count": 0, "total_ms": 0.0} for path in PARSE_PATHS}
+
+def _record_parse_path(path: str, started: float):
+    _parse_path_stats[path]["count"] += 1
+    _parse_path_stats[path]["total_ms"] += (time.perf_counter() - started) * 1000
+
+def get_parse_path_stats() -> dict:
+    total = sum(entry["count"] for entry in _parse_path_stats.values())
+    return {path: {"count": entry["count"],
+                   "hit_rate": round(entry["count"] / total, 4) if total else 0.0,
+                   "avg_ms": round(entry["total_ms"] / entry["count"], 3) if entry["count"] else 0.0}
+            for path, entry in _parse_path_stats.items()}
+
+async def resolve_query_parse(natural_language_query: str) -> dict:
+    """Parses a query via the cheapest path that can answer it: the local rule-based parser when it is
+    confident, then the exact parse cache, then a cached template, and finally the LLM."""
+    started = time.perf_counter()
+    parsed_data, confidence = fast_parse(natural_language_query)
+    if parsed_data is not None and confidence >= FAST_PARSE_MIN_CONFIDENCE:
+        print(f"Fast-path parse (confidence {confidence:.2f}) for query: '{natural_language_query}'")
+        _record_parse_path("fast_path", started)
+        return parsed_data
+
+    parsed_data = await run_db(get_cached_parse, natural_language_query, PARSE_PROMPT_VERSION)
+    if parsed_data is not None:
+        print(f"Parse cache hit for query: '{natural_language_query}'")
+        _record_parse_path("cache", started)
+        return parsed_data
+
+    parsed_data = await run_db(get_template_parse, natural_language_query, PARSE_PROMPT_VERSION)
+    if parsed_data is not None:
+        print(f"Parse template hit for query: '{natural_language_query}'")
+        await run_db(store_parse, natural_language_query, PARSE_PROMPT_VERSION, parsed_data)
+        _record_parse_path("template", started)
+        return parsed_data
+
+    if not client: raise HTTPException(status_code=503, detail="OpenAI client not initialized.")
+    parsed_data = await call_llm_parse(natural_language_query)
+    await run_db(store_template_parse, natural_language_query, PARSE_PROMPT_VERSION, parsed_data)
+    await run_db(store_parse, natural_language_query, PARSE_PROMPT_VERSION, parsed_data)
+    _record_parse_path("llm", started)
+    return parsed_data
+
 scheduler = AsyncIOScheduler()
 
+# "memory" (default) rebuilds every job at startup. "sqlite" (opt-in) keeps jobs in the apscheduler_jobs table so
+# restarts only reschedule checks that changed, at a steady-state cost: APScheduler calls the job store
+# synchronously on the event loop, so every job fire is an update_job write plus a commit, and every
+# get_job/remove_job from the pause/delete endpoints is a SQLite read or write on the loop. Choose it when
+# restart time for a large check count matters more than per-fire latency. Sharded workers always use memory,
+# since each holds only its own shards.
+SCHEDULER_JOBSTORE = os.getenv("FINOPS_SCHEDULER_JOBSTORE", "memory").lower()
+job_store = SQLiteJobStore() if SCHEDULER_JOBSTORE == "sqlite" and SCHEDULER_MODE != "sharded" else None
+
+# Opt-in load shaping: checks sharing a schedule ("* * * * *", "0 * * * *") would otherwise all fire in second 0.
+# Each check gets a stable second offset from a hash of its id, so fires spread across the first
+# SCHEDULE_SPREAD_SECONDS of the minute while the cron schedule itself is unchanged.
+SCHEDULE_LOAD_SHAPING = os.getenv("FINOPS_SCHEDULE_LOAD_SHAPING", "false").lower() in ("1", "true", "yes")
+SCHEDULE_SPREAD_SECONDS = max(1, min(60, int(os.getenv("FINOPS_SCHEDULE_SPREAD_SECONDS", "60"))))
+
+# Every scheduler pause goes through scheduler_paused(): nested or overlapping holders (startup, batch job
+# registration) share one pause, and only the last one to leave resumes the scheduler.
+_scheduler_pause_depth = 0
+
+@contextmanager
+def scheduler_paused():
+    global _scheduler_pause_depth
+    if _scheduler_pause_depth == 0 and scheduler.state == STATE_RUNNING:
+        scheduler.pause()
+    _scheduler_pause_depth += 1
+    try:
+        yield
+    finally:
+        _scheduler_pause_depth -= 1
+        if _scheduler_pause_depth == 0 and scheduler.state == STATE_PAUSED:
+            scheduler.resume()
+
+def schedule_offset_seconds(check_id: str) -> int:
+    return int(hashlib.sha1(check_id.encode('utf-8')).hexdigest(), 16) % SCHEDULE_SPREAD_SECONDS
+
+def build_check_trigger(check_id: str, schedule_string: str) -> CronTrigger:
+    if not SCHEDULE_LOAD_SHAPING:
+        return CronTrigger.from_crontab(schedule_string)
+    values = schedule_string.split()
+    if len(values) != 5:
+        raise ValueError(f"Wrong number of fields; got {len(values)}, expected 5")
+    # Same field mapping as CronTrigger.from_crontab, plus the per-check second
+    return CronTrigger(second=schedule_offset_seconds(check_id), minute=values[0], hour=values[1],
+                       day=values[2], month=values[3], day_of_week=values[4])
+
+def map_check_for_api(check: dict) -> dict:
+    """Maps database field names to the field names the frontend expects."""
+    return {
+        "id": check.get("id"),
+        "query": check.get("natural_query"),  # Map natural_query -> query
+        "schedule": check.get("schedule_string"),  # Map schedule_string -> schedule  
+        "condition": check.get("anomaly_condition_raw"),  # Map anomaly_condition_raw -> condition
+        "targetService": check.get("target_service"),
+        "suggestion": check.get("suggestion"),
+        "status": check.get("status"),
+        "created_at": check.get("created_at"),
+        "last_run_at": check.get("last_run_at"),
+        "next_run_at": check.get("next_run_at"),
+        "last_run_status": check.get("last_run_status"),
+        "data_source_id": check.get("data_source_id"),
+        "dataSourceName": check.get("dataSourceName"),
+        "dataSourceType": check.get("dataSourceType")
+    }
+
+async def cached_list_response(request: Request, cache_key: tuple, tenant_id: str, build) -> Response:
+    """Serves a polled list endpoint from the response cache: 304 if If-None-Match still matches, the cached
+    body if the tenant's data is unchanged, otherwise build() runs on the DB thread pool and is cached.
+    The body stays a plain JSON list; the cursor for the next page, if any, is in the X-Next-Cursor header."""
+    entry = get_cached_response(cache_key, tenant_id)
+    if entry is None:
+        entry = await run_db(build_cached_response, cache_key, tenant_id, build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"} # no-cache: clients revalidate every poll
+    if entry.next_cursor: headers["X-Next-Cursor"] = entry.next_cursor
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def validate_page_params(limit: Optional[int], cursor: Optional[str]):
+    if limit is not None and not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_LIMIT}.")
+    if cursor is not None:
+        try: decode_page_cursor(cursor)
+        except ValueError as e: raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/checks", response_model=List[dict])
-async def get_all_checks_api_endpoint():
+async def get_all_checks_api_endpoint(request: Request, limit: Optional[int] = None, cursor: Optional[str] = None,
+                                      status: Optional[str] = None, data_source_id: Optional[str] = None,
+                                      created_after: Optional[datetime] = None, created_before: Optional[datetime] = None):
+    """Without limit every matching check is returned (what the dashboard expects); with limit, pages of that
+    size follow X-Next-Cursor."""
+    validate_page_params(limit, cursor)
+    filters = (limit, cursor, status, data_source_id, created_after, created_before)
+    def build():
+        checks, next_cursor = get_checks_page_from_db(DEFAULT_TENANT_ID, *filters)
+        return [map_check_for_api(check) for check in checks], next_cursor
     try:
-        # Get raw checks from database
-        checks_raw = get_all_checks_for_tenant_from_db(DEFAULT_TENANT_ID)
-        
-        # Map database field names to frontend expected field names
-        checks_mapped = []
-        for check in checks_raw:
-            mapped_check = {
-                "id": check.get("id"),
-                "query": check.get("natural_query"),  # Map natural_query -> query
-                "schedule": check.get("schedule_string"),  # Map schedule_string -> schedule  
-                "condition": check.get("anomaly_condition_raw"),  # Map anomaly_condition_raw -> condition
-                "targetService": check.get("target_service"),
-                "suggestion": check.get("suggestion"),
-                "status": check.get("status"),
-                "created_at": check.get("created_at"),
-                "last_run_at": check.get("last_run_at"),
-                "next_run_at": check.get("next_run_at"),
-                "last_run_status": check.get("last_run_status"),
-                "data_source_id": check.get("data_source_id"),
-                "dataSourceName": check.get("dataSourceName"),
-                "dataSourceType": check.get("dataSourceType")
-            }
-            checks_mapped.append(mapped_check)
-        
-        return checks_mapped
-        
+        return await cached_list_response(request, ("checks", DEFAULT_TENANT_ID, filters), DEFAULT_TENANT_ID, build)
     except Exception as e:
         print(f"Error in get_all_checks_api_endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch checks: {str(e)}")
 
-# Also update the schedule_job_from_check_details function to handle both field names:
-def schedule_job_from_check_details(check_details: dict):
+async def schedule_job_from_check_details(check_details: dict):
+    await schedule_jobs_from_check_details([check_details])
+
+async def schedule_jobs_from_check_details(checks_details: list, extra_run_times: list = None) -> dict:
+    """Schedules many checks in one pass: validates them and builds their triggers on the DB thread pool,
+    registers the jobs in bulk on the event loop, then persists every next_run_at/last_run_status with a single
+    executemany (plus any extra_run_times rows the caller wants written in the same batch). Used by startup,
+    pause/resume, bulk imports and shard rebalancing. Returns {check_id: True if scheduling failed}."""
     if not scheduler.running:
         print("Scheduler not running. Cannot schedule job.")
-        return
-
-    check_id = check_details['id']
-    schedule_string = check_details.get('schedule_string') or check_details.get('schedule')
-    status = check_details.get('status')
-    # Handle both natural_query and query field names
-    natural_query = check_details.get('natural_query') or check_details.get('query', 'Scheduled FinOps Check')
-    
-    print(f"DEBUG Main: Attempting to schedule job for {check_id}. execute_check is: {execute_check}")
-
-    try:
-        if scheduler.get_job(check_id):
-            scheduler.remove_job(check_id)
-            print(f"Scheduler: Removed existing job {check_id} before (re)scheduling.")
-
-        if status == 'active':
-            if not schedule_string or schedule_string.lower() == 'n/a':
-                print(f"Scheduler: Skipping job {check_id} due to invalid schedule: '{schedule_string}'")
-                update_check_run_times_in_db(check_id, check_details.get('last_run_at'), None, check_details.get('last_run_status', 'error_scheduling'))
-                return
-
-            trigger = CronTrigger.from_crontab(schedule_string)
-            job = scheduler.add_job(
-                execute_check, trigger=trigger, args=[check_id], id=check_id,
-                name=natural_query[:100], replace_existing=True, misfire_grace_time=3600
-            )
-            next_run = job.next_run_time if job else None
-            update_check_run_times_in_db(
-                check_id, 
-                check_details.get('last_run_at'), 
-                next_run, 
-                check_details.get('last_run_status', 'pending')
-            )
-            print(f"Scheduler: Scheduled job ID {check_id}. Next run: {next_run}")
-        else: 
-            print(f"Scheduler: Check ID {check_id} is '{status}'. Not actively scheduling. Clearing next run time.")
-            update_check_run_times_in_db(check_id, check_details.get('last_run_at'), None, check_details.get('last_run_status', status))
-            if scheduler.get_job(check_id):
-                 scheduler.remove_job(check_id)
-    except ValueError as ve:
-        print(f"Scheduler: Error for job {check_id} (invalid schedule string '{schedule_string}'): {ve}")
-        update_check_status_in_db(check_id, 'error_scheduling', DEFAULT_TENANT_ID)
-        update_check_run_times_in_db(check_id, check_details.get('last_run_at'), None, 'error_scheduling')
-    except Exception as e: 
-        print(f"Scheduler: General error for job {check_id}: {type(e).__name__} - {e}")
-        update_check_status_in_db(check_id, 'error_scheduling', DEFAULT_TENANT_ID)
-        update_check_run_times_in_db(check_id, check_details.get('last_run_at'), None, 'error_scheduling')
+        return {}
+    log_each = len(checks_details) <= 20 # Per-check logging for API-sized calls, a summary for bulk ones
+    to_add, to_remove, run_times, failures = await run_db(_plan_check_jobs, checks_details, log_each)
+    _register_check_jobs(to_add, to_remove, run_times, failures, log_each)
+    await run_db(_persist_check_schedules, run_times + list(extra_run_times or []), failures)
+    if not log_each:
+        scheduled = sum(1 for check_details, _, _ in to_add if not failures[check_details['id']])
+        failed = sum(1 for failed in failures.values() if failed)
+        print(f"Scheduler: Batch scheduled {scheduled} jobs, removed/skipped {len(to_remove)}, {failed} errors.")
+    return failures
+
+def _plan_check_jobs(checks_details: list, log_each: bool):
+    """Pass 1, off the event loop: validates checks and builds their triggers. Checks sharing a schedule (and
+    load-shaping offset) share one trigger and its first fire time, so a bulk load parses each distinct cron
+    string once. Returns (to_add, to_remove, run_times, failures)."""
+    to_add, to_remove, run_times, failures = [], [], [], {}
+    triggers = {} # (schedule_string, offset) -> (trigger, next fire time)
+    now = datetime.now(scheduler.timezone)
+    for check_details in checks_details:
+        check_id = check_details['id']
+        schedule_string = check_details.get('schedule_string') or check_details.get('schedule')
+        status = check_details.get('status')
+        last_run_at = check_details.get('last_run_at')
+        if not owns_check(check_id): # Sharded mode: the worker holding this check's shard lease schedules it
+            to_remove.append(check_id)
+            continue
+        if status != 'active':
+            if log_each: print(f"Scheduler: Check ID {check_id} is '{status}'. Not actively scheduling. Clearing next run time.")
+            to_remove.append(check_id)
+            run_times.append((last_run_at, None, check_details.get('last_run_status', status), check_id))
+            failures[check_id] = False
+            continue
+        if not schedule_string or schedule_string.lower() == 'n/a':
+            print(f"Scheduler: Skipping job {check_id} due to invalid schedule: '{schedule_string}'")
+            to_remove.append(check_id)
+            run_times.append((last_run_at, None, check_details.get('last_run_status', 'error_scheduling'), check_id))
+            failures[check_id] = False
+            continue
+        trigger_key = (schedule_string, schedule_offset_seconds(check_id) if SCHEDULE_LOAD_SHAPING else None)
+        try:
+            if trigger_key not in triggers:
+                trigger = build_check_trigger(check_id, schedule_string)
+                triggers[trigger_key] = (trigger, trigger.get_next_fire_time(None, now))
+            to_add.append((check_details, *triggers[trigger_key]))
+        except ValueError as ve:
+            print(f"Scheduler: Error for job {check_id} (invalid schedule string '{schedule_string}'): {ve}")
+            to_remove.append(check_id)
+            run_times.append((last_run_at, None, 'error_scheduling', check_id))
+            failures[check_id] = True
+    return to_add, to_remove, run_times, failures
+
+def _register_check_jobs(to_add: list, to_remove: list, run_times: list, failures: dict, log_each: bool):
+    """Pass 2, on the event loop and without awaiting, so concurrent callers can't interleave: adds and removes
+    the planned jobs. The scheduler is paused meanwhile, otherwise every add/remove_job queues its own wakeup
+    (and job store poll)."""
+    with scheduler_paused(), (job_store.batch() if job_store else nullcontext()):
+        for check_id in to_remove:
+            try: scheduler.remove_job(check_id)
+            except JobLookupError: pass
+        for check_details, trigger, next_run_time in to_add:
+            check_id = check_details['id']
+            # Handle both natural_query and query field names
+            natural_query = check_details.get('natural_query') or check_details.get('query', 'Scheduled FinOps Check')
+            try:
+                job = scheduler.add_job(
+                    run_scheduled_check, trigger=trigger, args=[check_id], id=check_id, next_run_time=next_run_time,
+                    name=natural_query[:100], replace_existing=True, misfire_grace_time=3600
+                )
+                next_run = job.next_run_time if job else None
+                if log_each: print(f"Scheduler: Scheduled job ID {check_id}. Next run: {next_run}")
+                run_times.append((check_details.get('last_run_at'), next_run, check_details.get('last_run_status', 'pending'), check_id))
+                failures[check_id] = False
+            except Exception as e:
+                print(f"Scheduler: General error for job {check_id}: {type(e).__name__} - {e}")
+                run_times.append((check_details.get('last_run_at'), None, 'error_scheduling', check_id))
+                failures[check_id] = True
+
+
+def _persist_check_schedules(run_times: list, failures: dict):
+    """Pass 3, off the event loop: records scheduling errors and next run times in two batched writes."""
+    failed_ids = [check_id for check_id, failed in failures.items() if failed]
+    if failed_ids:
+        update_checks_status_many(failed_ids, 'error_scheduling', DEFAULT_TENANT_ID)
+    update_check_run_times_many(run_times)
+
+def _epoch_seconds(value):
+    if value is None: return None
+    if isinstance(value, datetime): return value.timestamp()
+    try: return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError: return None
+
+async def reconcile_jobs_with_db(active_checks: list):
+    """Startup with the persistent job store: diffs active checks against stored jobs by trigger fingerprint.
+    New/changed checks are (re)scheduled, jobs for deleted/paused checks are dropped, and unchanged jobs are
+    left alone; next_run_at for every touched or drifted check is written in one batched update."""
+    stored = job_store.get_job_fingerprints()
+    active = {row['id']: dict(row) for row in active_checks}
+    stale_job_ids = [job_id for job_id in stored if job_id not in active]
+    to_schedule, drifted_run_times = [], []
+    for check_id, check in active.items():
+        try:
+            expected = job_fingerprint(build_check_trigger(check_id, check.get('schedule_string') or ''))
+        except ValueError:
+            expected = None # Let schedule_jobs_from_check_details record the scheduling error
+        stored_fingerprint, stored_next_run = stored.get(check_id, (None, None))
+        if expected is None or stored_fingerprint != expected:
+            to_schedule.append(check)
+        elif stored_next_run is not None and abs((_epoch_seconds(check.get('next_run_at')) or 0) - stored_next_run) > 1:
+            drifted_run_times.append((check.get('last_run_at'), utc_timestamp_to_datetime(stored_next_run).astimezone(scheduler.timezone),
+                                      check.get('last_run_status'), check_id))
+    job_store.remove_jobs(stale_job_ids)
+    await schedule_jobs_from_check_details(to_schedule, drifted_run_times)
+    print(f"Scheduler: reconciled {len(active)} active checks with {len(stored)} stored jobs: "
+          f"{len(to_schedule)} (re)scheduled, {len(stale_job_ids)} removed, {len(active) - len(to_schedule)} unchanged.")
 
 def create_default_data_sources():
     print("Checking/creating default data sources with realistic types for default tenant...")
@@ -164,34 +435,69 @@ def create_default_data_sources():
             )
     print("Default data source setup for default tenant complete.")
 
+shard_coordinator = None # Set in sharded scheduler mode
+
 @app.on_event("startup")
 async def startup_event():
     print(f"DEBUG Main: execute_check at startup: {execute_check} (type: {type(execute_check)})")
     init_db() # This also creates the default tenant if not exists
+    start_write_behind() # Executor alerts/outcomes are batched; flushed again in shutdown_event
+    start_execution_backend() # FINOPS_EXECUTOR_MODE: checks run on a thread pool or warm worker processes
     # create_default_data_sources() # This will now use DEFAULT_TENANT_ID
     
-    if not scheduler.running:
-        scheduler.start()
-        print("APScheduler started.")
-    else:
-        print("APScheduler already running. Rescheduling jobs from DB...")
-        for job_item in scheduler.get_jobs(): scheduler.remove_job(job_item.id)
-        print("All existing jobs removed from scheduler before reloading from DB.")
+    with scheduler_paused(): # Jobs only start firing once they match the DB
+        if not scheduler.running:
+            if job_store: scheduler.add_jobstore(job_store, 'default')
+            scheduler.start(paused=True) # Resumed when scheduler_paused exits, so stale jobs can't fire first
+            print(f"APScheduler started ({'sqlite' if job_store else 'memory'} job store).")
+        else:
+            print("APScheduler already running. Rescheduling jobs from DB...")
+            for job_item in scheduler.get_jobs(): scheduler.remove_job(job_item.id)
+            print("All existing jobs removed from scheduler before reloading from DB.")
         
-    # Load active checks for the default tenant
-    active_checks = get_all_active_checks_from_db(DEFAULT_TENANT_ID)
-    print(f"Found {len(active_checks)} active checks in DB for default tenant to schedule.")
-    for check_row in active_checks:
-        schedule_job_from_check_details(dict(check_row))
+        # Load active checks for the default tenant
+        active_checks = get_all_active_checks_from_db(DEFAULT_TENANT_ID)
+        print(f"Found {len(active_checks)} active checks in DB for default tenant to schedule.")
+        register_known_services(check_row['target_service'] for check_row in active_checks) # Service ids for parse templates
+        if SCHEDULER_MODE == "sharded":
+            global shard_coordinator
+            shard_coordinator = ShardCoordinator(run_db, reconcile_owned_shards)
+            set_shard_coordinator(shard_coordinator)
+            await shard_coordinator.start() # First heartbeat claims shards and schedules their checks
+        elif job_store:
+            await reconcile_jobs_with_db(active_checks)
+        else:
+            await schedule_jobs_from_check_details([dict(check_row) for check_row in active_checks])
+
+async def reconcile_owned_shards(owned_shards: set):
+    """Sharded mode: makes the scheduler's jobs match the active checks in the shards this worker owns.
+    Runs after every heartbeat, so checks created/paused/deleted through any replica are picked up here."""
+    active_checks = await adb.get_all_active_checks_from_db(DEFAULT_TENANT_ID)
+    desired = {row['id']: dict(row) for row in active_checks if shard_for_check(row['id']) in owned_shards}
+    current = {job.id for job in scheduler.get_jobs()}
+    for job_id in current - desired.keys():
+        scheduler.remove_job(job_id)
+    new_checks = [desired[check_id] for check_id in desired.keys() - current]
+    if new_checks:
+        await schedule_jobs_from_check_details(new_checks)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     if scheduler.running: scheduler.shutdown(); print("APScheduler shut down.")
+    if shard_coordinator: await shard_coordinator.stop()
+    stop_execution_backend()
+    stop_write_behind() # After the scheduler, so outcomes from jobs that just finished are flushed
+    shutdown_db_executor()
+    close_all_db_connections()
 
 class QueryRequest(BaseModel):
     query: str
     dataSourceId: Optional[str] = None
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+    dataSourceId: Optional[str] = None # Default for items that don't name one
+
 class DataSourceCreateRequest(BaseModel):
     name: str
     type: str
@@ -211,7 +517,7 @@ async def root(): return {"message": "FinOps NL Parser Backend is running (Tenan
 async def list_data_sources_endpoint(): # Renamed to avoid conflict
     try:
         # For now, all users see data sources for the DEFAULT_TENANT_ID
-        sources_from_db = get_all_data_sources(DEFAULT_TENANT_ID)
+        sources_from_db = await adb.get_all_data_sources(DEFAULT_TENANT_ID)
         response_sources = []
         for src in sources_from_db:
             config_dict = json.loads(src['config']) if src.get('config') else None
@@ -224,12 +530,16 @@ async def list_data_sources_endpoint(): # Renamed to avoid conflict
 async def create_data_source_api_endpoint(ds_data: DataSourceCreateRequest): # Renamed
     ds_id = f"ds-{ds_data.type.lower().replace('_','-').replace(' ','-')}-{str(uuid.uuid4())[:8]}"
     config_to_save = ds_data.config if ds_data.config is not None else {}
-    success = add_data_source(
+    success = await adb.add_data_source(
         ds_id=ds_id, tenant_id=DEFAULT_TENANT_ID, # Use default tenant
         name=ds_data.name, ds_type=ds_data.type, config_dict=config_to_save
     )
     if success:
-        new_source_row = get_data_source_by_id(ds_id, DEFAULT_TENANT_ID)
+        if ds_data.type == "CSV":
+            # Convert to a columnar snapshot up front so the first scheduled run doesn't pay the CSV parse
+            try: await asyncio.to_thread(build_columnar_snapshot, config_to_save.get("path", "sample_data.csv"))
+            except Exception as e: print(f"Warning: Could not build columnar snapshot for data source '{ds_data.name}': {e}")
+        new_source_row = await adb.get_data_source_by_id(ds_id, DEFAULT_TENANT_ID)
         if new_source_row:
             new_source = dict(new_source_row)
             config_dict = json.loads(new_source['config']) if new_source.get('config') else None
@@ -241,100 +551,156 @@ async def create_data_source_api_endpoint(ds_data: DataSourceCreateRequest): # R
 
 @app.delete("/api/datasources/{ds_id}", status_code=200)
 async def delete_data_source_api_endpoint(ds_id: str):
-    source = get_data_source_by_id(ds_id, DEFAULT_TENANT_ID) # Check existence within tenant
+    source = await adb.get_data_source_by_id(ds_id, DEFAULT_TENANT_ID) # Check existence within tenant
     if not source:
         raise HTTPException(status_code=404, detail="Data source not found for this tenant.")
     
-    if delete_data_source_from_db(ds_id, DEFAULT_TENANT_ID): # Pass tenant_id for deletion
+    if await adb.delete_data_source_from_db(ds_id, DEFAULT_TENANT_ID): # Pass tenant_id for deletion
+        if source['type'] == "CSV":
+            config_dict = json.loads(source['config']) if source['config'] else {}
+            broadcast_invalidation(invalidate_csv_snapshot, config_dict.get("path", "sample_data.csv"))
         return {"message": "Data source deleted successfully"}
     else:
         # delete_data_source_from_db prints specific errors
         raise HTTPException(status_code=500, detail="Could not delete data source.")
 
+@app.get("/api/datasources/cache/stats")
+async def data_source_cache_stats_endpoint():
+    return {"csvSnapshotCache": get_csv_snapshot_cache_stats()}
 
-@app.post("/api/parse-query", status_code=201)
-async def parse_query_endpoint(request: QueryRequest):
-    if not client: raise HTTPException(status_code=503, detail="OpenAI client not initialized.")
-
-    natural_language_query = request.query
-    selected_data_source_id = request.dataSourceId
-    print(f"Received query: '{natural_language_query}', for dataSourceId: {selected_data_source_id}")
-
-    final_data_source_id = None
+async def resolve_data_source_id(selected_data_source_id: Optional[str]) -> str:
     # If a specific data source ID is provided, validate it belongs to the current tenant
     if selected_data_source_id:
-        ds_row = get_data_source_by_id(selected_data_source_id, DEFAULT_TENANT_ID)
-        if ds_row: final_data_source_id = ds_row['id']
+        ds_row = await adb.get_data_source_by_id(selected_data_source_id, DEFAULT_TENANT_ID)
+        if ds_row: return ds_row['id']
         else: print(f"Warning: Provided dataSourceId '{selected_data_source_id}' not found for default tenant. Defaulting.")
 
-    if not final_data_source_id: # Fallback to tenant's default CSV
-        default_source = get_data_source_by_name("Default FinOps CSV", DEFAULT_TENANT_ID) 
-        if default_source: final_data_source_id = default_source['id']; print(f"Using default data source for tenant: {default_source['name']}")
-        else: # Emergency fallback: first data source of the tenant
-            all_tenant_sources = get_all_data_sources(DEFAULT_TENANT_ID)
-            if all_tenant_sources: final_data_source_id = all_tenant_sources[0]['id']; print(f"CRITICAL: Default CSV for tenant not found. Using first available: {all_tenant_sources[0]['name']}")
-            else: raise HTTPException(status_code=500, detail="No data sources configured for this tenant.")
-    
-    # LLM Prompt (ensure it's your latest refined version)
-    system_prompt = """
-You are an AI assistant for a FinOps application. Your task is to parse a user's natural language query
-and extract scheduling information, anomaly detection rules, a target service if specified, and rightsizing suggestions.
-Return the output ONLY as a valid JSON object with the keys: "scheduleString", "anomalyCondition", "targetService", "actionableSuggestion".
+    # Fallback to tenant's default CSV
+    default_source = await adb.get_data_source_by_name("Default FinOps CSV", DEFAULT_TENANT_ID) 
+    if default_source: print(f"Using default data source for tenant: {default_source['name']}"); return default_source['id']
+    # Emergency fallback: first data source of the tenant
+    all_tenant_sources = await adb.get_all_data_sources(DEFAULT_TENANT_ID)
+    if all_tenant_sources: print(f"CRITICAL: Default CSV for tenant not found. Using first available: {all_tenant_sources[0]['name']}"); return all_tenant_sources[0]['id']
+    raise HTTPException(status_code=500, detail="No data sources configured for this tenant.")
+
+def build_check_record(natural_language_query: str, parsed_data: dict, data_source_id: str) -> dict:
+    db_check_data = {
+        'id': f"check-{uuid.uuid4()}", 'natural_query': natural_language_query,
+        'schedule_string': parsed_data.get("scheduleString"),
+        'anomaly_condition_raw': parsed_data.get("anomalyCondition"),
+        'target_service': parsed_data.get("targetService"),
+        'suggestion': parsed_data.get("actionableSuggestion"),
+        'data_source_id': data_source_id, 'status': 'active'
+    }
+    # Compile the condition once here; the executor only evaluates the stored rule
+    db_check_data['anomaly_rule'] = json.dumps(compile_anomaly_condition(db_check_data['anomaly_condition_raw']))
+    return db_check_data
+
+def check_creation_response(db_check_data: dict, ds_info: dict) -> dict:
+    return {
+        "id": db_check_data['id'], "query": db_check_data['natural_query'],
+        "schedule": db_check_data['schedule_string'],
+        "condition": db_check_data['anomaly_condition_raw'],
+        "targetService": db_check_data['target_service'],
+        "dataSourceId": db_check_data['data_source_id'],
+        "dataSourceName": ds_info.get('name', "N/A"),
+        "dataSourceType": ds_info.get('type', "N/A"),
+        "suggestion": db_check_data['suggestion'], "status": db_check_data['status']
+    }
+
+def parse_failure(e: Exception):
+    """Maps an exception raised while parsing/saving a query to (status_code, detail)."""
+    if isinstance(e, HTTPException): return e.status_code, e.detail
+    if isinstance(e, json.JSONDecodeError): return 500, "LLM parse error."
+    if isinstance(e, (APITimeoutError, asyncio.TimeoutError)): return 504, "LLM request timed out."
+    return 500, f"Error processing query: {type(e).__name__} - {str(e)}"
 
-- "scheduleString": A cron expression (e.g., "0 9 * * 1") or "N/A" if not specified.
-- "anomalyCondition": A concise description of the anomaly trigger (e.g., "cost > 15% above weekly average", "spend exceeds $100"). If a specific resource is identified in "targetService", do NOT repeat it in "anomalyCondition". If not specified, return "N/A".
-- "targetService": Extract the MOST SPECIFIC service name, resource identifier, or entity ID mentioned that the check directly monitors (e.g., "EC2", "S3", "K8S_POD_1", "my-specific-bucket", "AWS_CE_SVC_1"). If the query clearly indicates a check on a general service type (e.g., "overall Kubernetes spend", "all S3 buckets") and no more specific entity is mentioned for the core check, then return the general service type (e.g., "Kubernetes", "S3"). If no specific service is mentioned or it's about overall total costs, return null or "Overall".
-- "actionableSuggestion": The suggested action if an anomaly is detected. If not specified, return "N/A".
-"""
+@app.post("/api/parse-query", status_code=201)
+async def parse_query_endpoint(request: QueryRequest):
+    natural_language_query = request.query
+    print(f"Received query: '{natural_language_query}', for dataSourceId: {request.dataSourceId}")
+    final_data_source_id = await resolve_data_source_id(request.dataSourceId)
+    
     try:
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo-0125", response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"User Query: \"{natural_language_query}\""}
-            ],
-            temperature=0.1,
-        )
-        if hasattr(completion, 'choices'):
-            llm_response_content = completion.choices[0].message.content
-        else:
-            llm_response_content = completion['choices'][0]['message']['content']
-        print(f"LLM Raw Response: {llm_response_content}")
-        parsed_data = json.loads(llm_response_content)
-
-        check_id = f"check-{uuid.uuid4()}"
-        db_check_data = {
-            'id': check_id, 'natural_query': natural_language_query,
-            'schedule_string': parsed_data.get("scheduleString"),
-            'anomaly_condition_raw': parsed_data.get("anomalyCondition"),
-            'target_service': parsed_data.get("targetService"),
-            'suggestion': parsed_data.get("actionableSuggestion"),
-            'data_source_id': final_data_source_id, 'status': 'active'
-        }
-
-        if add_check_to_db(db_check_data, DEFAULT_TENANT_ID): # Pass tenant_id
-            full_check_details_row = get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
+        parsed_data = await resolve_query_parse(natural_language_query)
+        db_check_data = build_check_record(natural_language_query, parsed_data, final_data_source_id)
+        check_id = db_check_data['id']
+
+        if await adb.add_check_to_db(db_check_data, DEFAULT_TENANT_ID): # Pass tenant_id
+            full_check_details_row = await adb.get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
             if not full_check_details_row: raise HTTPException(status_code=500, detail="Failed to retrieve check after saving.")
             full_check_details = dict(full_check_details_row)
-            schedule_job_from_check_details(full_check_details) # APScheduler doesn't need tenant_id directly for job
+            await schedule_job_from_check_details(full_check_details) # APScheduler doesn't need tenant_id directly for job
+            publish_event(DEFAULT_TENANT_ID, "checks_changed", {"check_ids": [check_id], "change": "created"})
             
-            ds_info_row = get_data_source_by_id(final_data_source_id, DEFAULT_TENANT_ID) # Pass tenant_id
+            ds_info_row = await adb.get_data_source_by_id(final_data_source_id, DEFAULT_TENANT_ID) # Pass tenant_id
             ds_info = dict(ds_info_row) if ds_info_row else {}
-            
-            return {
-                "id": check_id, "query": natural_language_query,
-                "schedule": db_check_data['schedule_string'],
-                "condition": db_check_data['anomaly_condition_raw'],
-                "targetService": db_check_data['target_service'],
-                "dataSourceId": db_check_data['data_source_id'],
-                "dataSourceName": ds_info.get('name', "N/A"),
-                "dataSourceType": ds_info.get('type', "N/A"),
-                "suggestion": db_check_data['suggestion'], "status": db_check_data['status']
-            }
+            return check_creation_response(db_check_data, ds_info)
         else: raise HTTPException(status_code=500, detail="Failed to save check to database.")
-    except json.JSONDecodeError: raise HTTPException(status_code=500, detail="LLM parse error.")
-    except Exception as e: raise HTTPException(status_code=500, detail=f"Error processing query: {type(e).__name__} - {str(e)}")
-
+    except Exception as e:
+        status_code, detail = parse_failure(e)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+@app.post("/api/parse-query/batch")
+async def parse_query_batch_endpoint(request: BatchQueryRequest):
+    """Creates many checks at once: queries are parsed concurrently (at most PARSE_BATCH_CONCURRENCY at a time),
+    all checks are inserted in one transaction and all jobs are registered in one scheduler pass.
+    Items succeed or fail independently; the response lists a result per query in request order."""
+    if len(request.queries) > PARSE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {PARSE_BATCH_MAX_ITEMS} queries per batch.")
+    print(f"Received batch of {len(request.queries)} queries.")
+
+    # Resolve each distinct data source once
+    data_source_ids = {}
+    for item in request.queries:
+        selected = item.dataSourceId or request.dataSourceId
+        if selected not in data_source_ids:
+            data_source_ids[selected] = await resolve_data_source_id(selected)
+
+    semaphore = asyncio.Semaphore(PARSE_BATCH_CONCURRENCY)
+    async def parse_item(item: QueryRequest):
+        async with semaphore:
+            try:
+                parsed_data = await resolve_query_parse(item.query)
+                return build_check_record(item.query, parsed_data, data_source_ids[item.dataSourceId or request.dataSourceId]), None
+            except Exception as e:
+                return None, parse_failure(e)
+    parsed_items = await asyncio.gather(*[parse_item(item) for item in request.queries])
+
+    results = [None] * len(parsed_items)
+    records = []
+    for index, (db_check_data, failure) in enumerate(parsed_items):
+        if failure:
+            results[index] = {"index": index, "query": request.queries[index].query, "status": failure[0], "error": failure[1]}
+        else:
+            records.append((index, db_check_data))
+
+    insert_errors = await adb.add_checks_to_db([record for _, record in records], DEFAULT_TENANT_ID) if records else {}
+    saved = [(index, record) for index, record in records if insert_errors.get(record['id']) is None]
+    saved_rows = {row['id']: dict(row) for row in await adb.get_checks_by_ids_from_db([record['id'] for _, record in saved], DEFAULT_TENANT_ID)} if saved else {}
+    scheduling_failures = await schedule_jobs_from_check_details(list(saved_rows.values())) if saved_rows else {}
+    if saved_rows: publish_event(DEFAULT_TENANT_ID, "checks_changed", {"check_ids": list(saved_rows), "change": "created"})
+
+    ds_infos = {}
+    for ds_id in set(data_source_ids.values()):
+        ds_info_row = await adb.get_data_source_by_id(ds_id, DEFAULT_TENANT_ID)
+        ds_infos[ds_id] = dict(ds_info_row) if ds_info_row else {}
+    for index, record in records:
+        if insert_errors.get(record['id']) is not None:
+            results[index] = {"index": index, "query": record['natural_query'], "status": 500, "error": f"Failed to save check to database: {insert_errors[record['id']]}"}
+            continue
+        if scheduling_failures.get(record['id']):
+            record['status'] = 'error_scheduling'
+        results[index] = {"index": index, "query": record['natural_query'], "status": 201,
+                          "check": check_creation_response(record, ds_infos[record['data_source_id']])}
+
+    created = sum(1 for result in results if result["status"] == 201)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+@app.get("/api/parse-query/stats")
+async def parse_query_stats_endpoint():
+    return {"promptVersion": PARSE_PROMPT_VERSION, "fastPathMinConfidence": FAST_PARSE_MIN_CONFIDENCE,
+            "paths": get_parse_path_stats(), "parseCache": get_parse_cache_stats()}
 
 '''
 @app.get("/api/checks", response_model=List[dict]) # Keep response model flexible for now
@@ -345,48 +711,97 @@ async def get_all_checks_api_endpoint(): # Renamed
 '''
 
 @app.get("/api/alerts", response_model=List[dict])
-async def get_alerts_api_endpoint(limit: int = 20): # Renamed
-    try: return get_alerts_from_db(DEFAULT_TENANT_ID, limit=limit) # Pass tenant_id
+async def get_alerts_api_endpoint(request: Request, limit: int = 20, cursor: Optional[str] = None, # Renamed
+                                  check_id: Optional[str] = None, is_read: Optional[bool] = None,
+                                  since: Optional[datetime] = None, until: Optional[datetime] = None):
+    validate_page_params(limit, cursor)
+    filters = (limit, cursor, check_id, is_read, since, until)
+    try:
+        return await cached_list_response(request, ("alerts", DEFAULT_TENANT_ID, filters), DEFAULT_TENANT_ID,
+                                          lambda: get_alerts_page_from_db(DEFAULT_TENANT_ID, *filters)) # Pass tenant_id
     except Exception as e: raise HTTPException(status_code=500, detail="Failed to fetch alerts.")
 
+EVENT_STREAM_HEARTBEAT_SECONDS = float(os.getenv("FINOPS_EVENT_STREAM_HEARTBEAT_SECONDS", "15"))
+
+def format_sse(event_type: str, data: dict, event_id: str = None) -> str:
+    id_line = f"id: {event_id}\n" if event_id else ""
+    return f"{id_line}event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/api/events")
+async def events_stream_endpoint(request: Request, last_event_id: Optional[str] = None):
+    """Server-Sent Events stream of the tenant's live updates: "alert", "check_run" (a check's latest run outcome)
+    and "checks_changed" (checks created/paused/resumed/deleted). Resumes after the Last-Event-ID header, which
+    EventSource sends on reconnect, or the last_event_id parameter. A "resync" event means updates were missed
+    and the client should refetch /api/checks and /api/alerts."""
+    subscription, backlog = subscribe_events(DEFAULT_TENANT_ID, request.headers.get("last-event-id") or last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n" # Reconnect delay for EventSource
+            if backlog is None: yield format_sse("resync", {})
+            for event_id, _, event_type, data in backlog or []:
+                yield format_sse(event_type, data, event_id)
+            while not await request.is_disconnected():
+                if subscription.overflowed: # Fell too far behind; drop the queue and have the client refetch
+                    while not subscription.queue.empty(): subscription.queue.get_nowait()
+                    subscription.overflowed = False
+                    yield format_sse("resync", {})
+                try:
+                    event_id, _, event_type, data = await asyncio.wait_for(subscription.queue.get(), EVENT_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n" # Also lets is_disconnected() notice closed clients
+                    continue
+                yield format_sse(event_type, data, event_id)
+        finally:
+            unsubscribe_events(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/checks/{check_id}/pause")
 async def pause_check_api_endpoint(check_id: str): # Renamed
-    check_row = get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
+    check_row = await adb.get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
     if not check_row: raise HTTPException(status_code=404, detail="Check not found")
     check_details = dict(check_row)
     try:
         if scheduler.get_job(check_id): scheduler.remove_job(check_id)
-        update_check_status_in_db(check_id, 'paused', DEFAULT_TENANT_ID) # Pass tenant_id
+        await adb.update_check_status_in_db(check_id, 'paused', DEFAULT_TENANT_ID) # Pass tenant_id
         check_details['status'] = 'paused'
-        schedule_job_from_check_details(check_details)
+        await schedule_job_from_check_details(check_details)
+        publish_event(DEFAULT_TENANT_ID, "checks_changed", {"check_ids": [check_id], "change": "paused"})
         return {"message": f"Check {check_id} paused."}
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/checks/{check_id}/resume")
 async def resume_check_api_endpoint(check_id: str): # Renamed
-    check_row = get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
+    check_row = await adb.get_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
     if not check_row: raise HTTPException(status_code=404, detail="Check not found")
     check_details = dict(check_row)
     try:
-        update_check_status_in_db(check_id, 'active', DEFAULT_TENANT_ID) # Pass tenant_id
+        await adb.update_check_status_in_db(check_id, 'active', DEFAULT_TENANT_ID) # Pass tenant_id
         check_details['status'] = 'active'
-        schedule_job_from_check_details(check_details)
+        await schedule_job_from_check_details(check_details)
+        publish_event(DEFAULT_TENANT_ID, "checks_changed", {"check_ids": [check_id], "change": "resumed"})
         return {"message": f"Check {check_id} resumed."}
     except Exception as e: raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/checks/{check_id}")
 async def delete_check_api_endpoint(check_id: str): # Renamed
-    if not get_check_from_db(check_id, DEFAULT_TENANT_ID): # Pass tenant_id
+    if not await adb.get_check_from_db(check_id, DEFAULT_TENANT_ID): # Pass tenant_id
         raise HTTPException(status_code=404, detail="Check not found for this tenant")
     try:
         job = scheduler.get_job(check_id)
         if job: scheduler.remove_job(check_id); print(f"Removed job {check_id} from scheduler.")
         else: print(f"Job {check_id} not found in scheduler for removal.")
-        delete_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
+        await adb.delete_check_from_db(check_id, DEFAULT_TENANT_ID) # Pass tenant_id
+        broadcast_invalidation(invalidate_compiled_rule, check_id)
+        broadcast_invalidation(invalidate_rolling_state, check_id)
+        broadcast_invalidation(invalidate_incident_state, check_id)
+        publish_event(DEFAULT_TENANT_ID, "checks_changed", {"check_ids": [check_id], "change": "deleted"})
         return {"message": f"Check {check_id} deleted successfully."}
     except Exception as e:
         print(f"Error during delete process for check {check_id}: {e}")
         # Attempt to delete from DB even if scheduler interaction fails
-        try: delete_check_from_db(check_id, DEFAULT_TENANT_ID)
+        try: await adb.delete_check_from_db(check_id, DEFAULT_TENANT_ID)
         except Exception as db_e: raise HTTPException(status_code=500, detail=f"DB delete error: {db_e}. Orig err: {e}")
         raise HTTPException(status_code=500, detail=f"Scheduler err, but deleted from DB: {e}")
\ No newline at end of file
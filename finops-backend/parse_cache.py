@@ -0,0 +1,180 @@
+# parse_cache.py
+# Persistent cache of LLM parse results (scheduleString / anomalyCondition / targetService / actionableSuggestion),
+# stored in SQLite and keyed on the normalized query text plus the system-prompt version, so repeated or
+# trivially different queries (whitespace, casing, punctuation) skip the LLM call.
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from database import get_parse_cache_entry, put_parse_cache_entry
+
+PARSE_CACHE_TTL_SECONDS = int(os.getenv("FINOPS_PARSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("FINOPS_PARSE_CACHE_MAX_ENTRIES", "10000"))
+PARSE_RESULT_KEYS = ("scheduleString", "anomalyCondition", "targetService", "actionableSuggestion")
+
+_parse_cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                      "template_hits": 0, "template_misses": 0, "template_stores": 0}
+_parse_cache_stats_lock = threading.Lock()
+
+PARSE_CACHE_KEY_VERSION = "2" # Bump when normalize_query_text changes, so keys from the old normalization stop matching
+# Comparison operators carry meaning ("cost > $100" vs "cost < $100"), so they become words instead of being dropped
+COMPARISON_OPERATOR_WORDS = {">=": " gte ", "<=": " lte ", "!=": " ne ", "==": " eq ", ">": " gt ", "<": " lt ", "=": " eq "}
+COMPARISON_OPERATOR_PATTERN = re.compile("|".join(re.escape(op) for op in COMPARISON_OPERATOR_WORDS))
+
+def normalize_query_text(query: str) -> str:
+    """Lowercases, spells out comparison operators, drops other punctuation (keeping $, %, _, - and decimal
+    points) and collapses whitespace."""
+    text = (query or "").lower()
+    text = COMPARISON_OPERATOR_PATTERN.sub(lambda m: COMPARISON_OPERATOR_WORDS[m.group(0)], text)
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text) # Periods that aren't decimal points
+    text = re.sub(r"[^\w\s$%.\-]", " ", text)
+    return " ".join(text.split())
+
+def parse_cache_key(normalized_query: str, prompt_version: str) -> str:
+    return hashlib.sha1(f"v{PARSE_CACHE_KEY_VERSION}\n{prompt_version}\n{normalized_query}".encode('utf-8')).hexdigest()
+
+def _bump_stat(name: str, amount: int = 1):
+    with _parse_cache_stats_lock:
+        _parse_cache_stats[name] += amount
+
+def get_cached_parse(query: str, prompt_version: str):
+    """Returns the cached parse dict for a query, or None on a miss/expired entry."""
+    now = time.time()
+    cache_key = parse_cache_key(normalize_query_text(query), prompt_version)
+    response_json = get_parse_cache_entry(cache_key, now - PARSE_CACHE_TTL_SECONDS, now)
+    if response_json is None:
+        _bump_stat("misses")
+        return None
+    _bump_stat("hits")
+    return json.loads(response_json)
+
+def store_parse(query: str, prompt_version: str, parsed_data: dict):
+    if not isinstance(parsed_data, dict) or not all(key in parsed_data for key in PARSE_RESULT_KEYS):
+        return # Don't cache malformed LLM output
+    normalized_query = normalize_query_text(query)
+    response_json = json.dumps({key: parsed_data.get(key) for key in PARSE_RESULT_KEYS})
+    evicted = put_parse_cache_entry(parse_cache_key(normalized_query, prompt_version), prompt_version, normalized_query,
+                                    response_json, time.time(), PARSE_CACHE_MAX_ENTRIES)
+    _bump_stat("stores")
+    if evicted:
+        _bump_stat("evictions", evicted)
+
+def get_parse_cache_stats() -> dict:
+    with _parse_cache_stats_lock:
+        stats = dict(_parse_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    template_lookups = stats["template_hits"] + stats["template_misses"]
+    stats["template_hit_rate"] = round(stats["template_hits"] / template_lookups, 4) if template_lookups else 0.0
+    stats["known_services"] = len(_known_services)
+    return stats
+
+# --- Template reuse ---
+# Queries that differ only in service ids, dollar amounts and numbers ("Monitor <SVC> spending every minute.
+# If <SVC> cost is greater than $<N>, ...") share a template signature. The first LLM parse for a template is
+# stored with its slot values replaced by placeholders; later queries substitute their own values back in.
+# A template is only stored when every slot maps unambiguously into the parse result.
+SERVICE_ID_PATTERN = r"[A-Za-z][A-Za-z0-9]*(?:_[A-Za-z0-9]+)*_\d+" # e.g. AWS_CE_SVC_1, K8S_POD_2
+NUMBER_PATTERN = r"\d+(?:,\d{3})*(?:\.\d+)?"
+SLOT_MARKERS = {"svc": "__svc", "usd": "__usd", "num": "__num"}
+NON_SERVICE_TARGETS = {"overall", "all", "n/a", "none", "null"}
+_known_services = set() # Lowercased service names seen in checks/parses (e.g. "ec2", "s3")
+_known_services_lock = threading.Lock()
+
+def register_known_services(service_names):
+    with _known_services_lock:
+        for name in service_names:
+            if name and " " not in name.strip() and name.strip().lower() not in NON_SERVICE_TARGETS:
+                _known_services.add(name.strip().lower())
+
+def known_services_snapshot() -> list:
+    """Known service names, longest first so regex alternations prefer the longest match."""
+    with _known_services_lock:
+        return sorted(_known_services, key=len, reverse=True)
+
+def _slot_regex():
+    known = known_services_snapshot()
+    service_alternatives = [SERVICE_ID_PATTERN] + [re.escape(name) for name in known]
+    return re.compile(
+        rf"(?P<svc>(?<![\w$])(?:{'|'.join(service_alternatives)})(?!\w))"
+        rf"|(?P<usd>\$\s?{NUMBER_PATTERN})"
+        rf"|(?P<num>(?<![\w.]){NUMBER_PATTERN}(?![\w]|\.\d))",
+        re.IGNORECASE,
+    )
+
+def extract_query_template(query: str):
+    """Masks service ids, dollar amounts and numbers. Returns (signature, [(slot_kind, value), ...]).
+
+    A value repeated in the query reuses its slot, so "<SVC_A> ... <SVC_A>" and "<SVC_A> ... <SVC_B>" differ.
+    The signature is built from normalize_query_text, which keeps comparison operators, so "> $<N>" and
+    "< $<N>" are different templates.
+    """
+    slots = []
+    def mask(match):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind != "svc":
+            value = value.lstrip("$").strip().replace(",", "")
+        index = next((i for i, (_, existing) in enumerate(slots) if existing.lower() == value.lower()), None)
+        if index is None:
+            index = len(slots)
+            slots.append((kind, value))
+        return f" {SLOT_MARKERS[kind]}{index} "
+    masked = _slot_regex().sub(mask, query or "")
+    return normalize_query_text(masked), slots
+
+def _slot_value_regex(kind: str, value: str):
+    if kind == "svc":
+        return re.compile(rf"(?<![\w]){re.escape(value)}(?!\w)", re.IGNORECASE)
+    return re.compile(rf"(?<![\d.]){re.escape(value)}(?!\.?\d)")
+
+def _templatize_parse(parsed_data: dict, slots: list):
+    """Replaces slot values in the parse result with {{slotN}} placeholders, or returns None if ambiguous."""
+    templated = {key: parsed_data.get(key) for key in PARSE_RESULT_KEYS}
+    for index, (kind, value) in enumerate(slots):
+        pattern = _slot_value_regex(kind, value)
+        occurrences = sum(len(pattern.findall(v)) for v in templated.values() if isinstance(v, str))
+        # Every slot must land in the result; numbers exactly once so e.g. a "1" can't be confused with a cron "1-5"
+        if occurrences == 0 or (kind != "svc" and occurrences != 1):
+            return None
+        for key, field_value in templated.items():
+            if isinstance(field_value, str):
+                templated[key] = pattern.sub(f"{{{{slot{index}}}}}", field_value)
+    return templated
+
+def get_template_parse(query: str, prompt_version: str):
+    signature, slots = extract_query_template(query)
+    if not slots:
+        return None
+    now = time.time()
+    cache_key = parse_cache_key(f"template:{signature}", prompt_version)
+    response_json = get_parse_cache_entry(cache_key, now - PARSE_CACHE_TTL_SECONDS, now)
+    if response_json is None:
+        _bump_stat("template_misses")
+        return None
+    templated = json.loads(response_json)
+    parsed_data = {}
+    for key, field_value in templated.items():
+        if isinstance(field_value, str):
+            for index, (_, value) in enumerate(slots):
+                field_value = field_value.replace(f"{{{{slot{index}}}}}", value)
+        parsed_data[key] = field_value
+    _bump_stat("template_hits")
+    return parsed_data
+
+def store_template_parse(query: str, prompt_version: str, parsed_data: dict):
+    if not isinstance(parsed_data, dict) or not all(key in parsed_data for key in PARSE_RESULT_KEYS):
+        return
+    register_known_services([parsed_data.get("targetService")] if isinstance(parsed_data.get("targetService"), str) else [])
+    signature, slots = extract_query_template(query)
+    templated = _templatize_parse(parsed_data, slots) if slots else None
+    if templated is None:
+        return
+    evicted = put_parse_cache_entry(parse_cache_key(f"template:{signature}", prompt_version), prompt_version,
+                                    f"template:{signature}", json.dumps(templated), time.time(), PARSE_CACHE_MAX_ENTRIES)
+    _bump_stat("template_stores")
+    if evicted:
+        _bump_stat("evictions", evicted)
@@ -0,0 +1,67 @@
+# response_cache.py
+# Serialized JSON bodies for the polled list endpoints (/api/checks, /api/alerts), keyed on the endpoint and its
+# parameters and tagged with the tenant's data version (database.get_data_version) at build time. While the
+# version is unchanged a poll is answered from memory, and a matching If-None-Match gets a 304, without touching
+# SQLite. In sharded scheduler mode other processes write to the same database without bumping this process's
+# versions, so entries are also rebuilt once they are RESPONSE_CACHE_SHARED_TTL_SECONDS old; the ETag is a hash
+# of the body, so a rebuild that finds nothing new still answers 304.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+
+from database import get_data_version
+from scheduler_shards import SCHEDULER_MODE
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("FINOPS_RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_SHARED_TTL_SECONDS = float(os.getenv("FINOPS_RESPONSE_CACHE_SHARED_TTL_SECONDS", "5"))
+_response_cache = OrderedDict() # (endpoint, tenant_id, params) -> CachedResponse
+_response_cache_lock = threading.Lock()
+
+class CachedResponse:
+    __slots__ = ("version", "body", "next_cursor", "etag", "built_at")
+
+    def __init__(self, version: str, body: bytes, next_cursor, etag: str, built_at: float):
+        self.version = version
+        self.body = body
+        self.next_cursor = next_cursor
+        self.etag = etag
+        self.built_at = built_at
+
+def get_cached_response(cache_key: tuple, tenant_id: str):
+    """The cached response for cache_key if the tenant's data hasn't changed since it was built, else None."""
+    version = get_data_version(tenant_id)
+    with _response_cache_lock:
+        entry = _response_cache.get(cache_key)
+        if entry is None or entry.version != version:
+            return None
+        if SCHEDULER_MODE == "sharded" and time.monotonic() - entry.built_at > RESPONSE_CACHE_SHARED_TTL_SECONDS:
+            return None
+        _response_cache.move_to_end(cache_key)
+        return entry
+
+def build_cached_response(cache_key: tuple, tenant_id: str, build) -> CachedResponse:
+    """Runs build() (a sync DB read returning (page, next_cursor)), serializes the page and caches the result.
+    The version is read first, so a write that lands while building leaves the entry already stale."""
+    version = get_data_version(tenant_id)
+    payload, next_cursor = build()
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    etag = hashlib.sha1(body + (next_cursor or "").encode("utf-8")).hexdigest()[:20]
+    entry = CachedResponse(version, body, next_cursor, f'"{etag}"', time.monotonic())
+    with _response_cache_lock:
+        _response_cache[cache_key] = entry
+        _response_cache.move_to_end(cache_key)
+        while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+            _response_cache.popitem(last=False)
+    return entry
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or etag in (candidate[2:] if candidate.startswith("W/") else candidate for candidate in candidates)
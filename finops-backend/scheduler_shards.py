@@ -0,0 +1,91 @@
+# scheduler_shards.py
+# Sharded scheduler mode (FINOPS_SCHEDULER_MODE=sharded): several API/scheduler processes share one database
+# and each schedules only the checks in the shards it holds a lease on, so no check fires twice.
+#   check_id -> shard      fixed hash, SCHEDULER_SHARDS buckets
+#   shard    -> worker     rendezvous hashing over live workers, so a join/leave only moves that worker's shards
+# Workers heartbeat every SCHEDULER_HEARTBEAT_SECONDS; leases expire after SCHEDULER_LEASE_SECONDS without a
+# renewal. A shard changes hands only after its old owner releases it or its lease expires, and a worker whose
+# own leases have lapsed stops firing checks even before it notices.
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+
+from database import heartbeat_scheduler_worker, sync_shard_leases, release_scheduler_worker
+
+SCHEDULER_MODE = os.getenv("FINOPS_SCHEDULER_MODE", "single").lower() # "single" or "sharded"
+SCHEDULER_SHARDS = int(os.getenv("FINOPS_SCHEDULER_SHARDS", "64"))
+SCHEDULER_HEARTBEAT_SECONDS = float(os.getenv("FINOPS_SCHEDULER_HEARTBEAT_SECONDS", "10"))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("FINOPS_SCHEDULER_LEASE_SECONDS", "30"))
+
+def shard_for_check(check_id: str) -> int:
+    return int(hashlib.md5(check_id.encode('utf-8')).hexdigest()[:8], 16) % SCHEDULER_SHARDS
+
+def shard_owner(shard: int, live_workers) -> str:
+    """Rendezvous (highest random weight) hashing of a shard onto the live workers."""
+    return max(live_workers, key=lambda worker_id: hashlib.md5(f"{worker_id}:{shard}".encode('utf-8')).digest())
+
+class ShardCoordinator:
+    def __init__(self, run_db, on_ownership_changed):
+        """run_db awaits a sync DB call off the event loop; on_ownership_changed(owned_shards) is awaited after
+        every heartbeat so the caller can reconcile its scheduler jobs with the shards it now owns."""
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.owned_shards = set()
+        self.leases_valid_until = 0.0
+        self._run_db = run_db
+        self._on_ownership_changed = on_ownership_changed
+        self._task = None
+
+    def owns_check(self, check_id: str) -> bool:
+        return time.time() < self.leases_valid_until and shard_for_check(check_id) in self.owned_shards
+
+    async def heartbeat(self):
+        now = time.time()
+        live_workers = await self._run_db(heartbeat_scheduler_worker, self.worker_id, socket.gethostname(), os.getpid(),
+                                          now, now - SCHEDULER_LEASE_SECONDS)
+        desired = {shard for shard in range(SCHEDULER_SHARDS) if shard_owner(shard, live_workers) == self.worker_id}
+        owned_before = set(self.owned_shards)
+        # Stop scheduling shards we are giving up before the lease rows let another worker take them
+        released = self.owned_shards - desired
+        if released:
+            self.owned_shards -= released
+            await self._on_ownership_changed(self.owned_shards)
+        owned = await self._run_db(sync_shard_leases, self.worker_id, desired, now, SCHEDULER_LEASE_SECONDS)
+        if owned != owned_before:
+            print(f"Scheduler shards: {self.worker_id} owns {len(owned)}/{SCHEDULER_SHARDS} shards across {len(live_workers)} live workers.")
+        self.owned_shards = owned
+        self.leases_valid_until = now + SCHEDULER_LEASE_SECONDS
+        await self._on_ownership_changed(self.owned_shards)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(SCHEDULER_HEARTBEAT_SECONDS)
+            try:
+                await self.heartbeat()
+            except Exception as e: # A missed heartbeat is survivable until the lease runs out
+                print(f"Scheduler shards: heartbeat failed for {self.worker_id}: {type(e).__name__} - {e}")
+
+    async def start(self):
+        await self.heartbeat()
+        self._task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+        self.owned_shards = set()
+        self.leases_valid_until = 0.0
+        await self._run_db(release_scheduler_worker, self.worker_id) # Hand shards over without waiting for expiry
+
+_coordinator = None
+
+def set_shard_coordinator(coordinator):
+    global _coordinator
+    _coordinator = coordinator
+
+def owns_check(check_id: str) -> bool:
+    """True when this process should schedule/run the check (always, outside sharded mode)."""
+    return _coordinator is None or _coordinator.owns_check(check_id)
@@ -0,0 +1,22 @@
+# scheduler_worker.py
+# Runs the scheduler (and execution backend) without serving the API, for scaling check execution across
+# processes/hosts that share the database. Use with FINOPS_SCHEDULER_MODE=sharded so workers split the checks.
+# Usage (from finops-backend/): FINOPS_SCHEDULER_MODE=sharded python scheduler_worker.py
+import asyncio
+import signal
+
+import main
+
+async def run_worker():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await main.startup_event()
+    try:
+        await stop.wait()
+    finally:
+        await main.shutdown_event()
+
+if __name__ == '__main__':
+    asyncio.run(run_worker())
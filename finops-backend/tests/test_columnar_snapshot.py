@@ -0,0 +1,41 @@
+# tests/test_columnar_snapshot.py
+# Run from finops-backend/: python -m pytest -q tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+import executor
+
+ROWS = 150_000 # Well past pyarrow's first (type-inference) block
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    return tmp_path / "snapshots"
+
+def write_csv(path, last_cost: str):
+    with open(path, "w") as f:
+        f.write("date,service_name,cost\n")
+        f.writelines(f"2026-01-01,EC2,{10 + i % 7}\n" for i in range(ROWS))
+        f.write(f"2026-01-02,EC2,{last_cost}\n")
+
+def test_integral_costs_with_later_decimals_convert(tmp_path, snapshot_dir):
+    csv_path = tmp_path / "costs.csv"
+    write_csv(csv_path, "10.75")
+    snapshot_path = executor.build_columnar_snapshot(str(csv_path))
+    data = executor._read_columnar_snapshot(snapshot_path, ["date", "cost"])
+    assert len(data) == ROWS + 1
+    assert data["cost"].iloc[-1] == pytest.approx(10.75)
+
+def test_failed_build_is_cleaned_up_and_remembered(tmp_path, snapshot_dir):
+    csv_path = tmp_path / "costs.csv"
+    write_csv(csv_path, "n/a-cost")
+    with pytest.raises(Exception):
+        executor.build_columnar_snapshot(str(csv_path))
+    assert not [name for name in os.listdir(snapshot_dir) if name.endswith(".tmp")]
+    assert executor.build_columnar_snapshot(str(csv_path)) is None # Same file version: no second attempt
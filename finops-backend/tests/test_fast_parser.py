@@ -0,0 +1,62 @@
+# tests/test_fast_parser.py
+# Run from finops-backend/: python -m pytest -q tests
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("pandas")
+pytest.importorskip("apscheduler")
+
+from apscheduler.triggers.cron import CronTrigger
+
+from fast_parser import fast_parse, parse_schedule, FAST_PARSE_MIN_CONFIDENCE
+
+MONDAY, SUNDAY = 0, 6 # datetime.weekday()
+
+def fire_weekdays(schedule: str, count: int = 14) -> set:
+    """Weekdays of the trigger's next `count` fire times, starting from a Sunday."""
+    trigger = CronTrigger.from_crontab(schedule, timezone="UTC")
+    fire_time = datetime(2026, 1, 4, tzinfo=trigger.timezone) # A Sunday
+    weekdays = set()
+    for _ in range(count):
+        fire_time = trigger.get_next_fire_time(None, fire_time + timedelta(seconds=1))
+        weekdays.add(fire_time.weekday())
+    return weekdays
+
+@pytest.mark.parametrize("text, expected_weekdays", [
+    ("every weekday at 2 am", {0, 1, 2, 3, 4}),
+    ("every weekend at 2 am", {5, 6}),
+    ("weekly", {MONDAY}),
+    ("every sunday at noon", {SUNDAY}),
+    ("every monday at 9 am", {MONDAY}),
+    ("every friday", {4}),
+    ("every saturday", {5}),
+])
+def test_schedule_fires_on_the_named_days(text, expected_weekdays):
+    schedule, _ = parse_schedule(text)
+    assert fire_weekdays(schedule) == expected_weekdays
+
+def test_weekday_schedule_fires_at_the_named_time():
+    schedule, _ = parse_schedule("every weekday at 2 am")
+    trigger = CronTrigger.from_crontab(schedule, timezone="UTC")
+    fire_time = trigger.get_next_fire_time(None, datetime(2026, 1, 3, 12, tzinfo=trigger.timezone)) # Saturday noon
+    assert fire_time == datetime(2026, 1, 5, 2, tzinfo=trigger.timezone) # Monday 2 AM
+
+def test_plain_comparison_is_confident():
+    parsed, confidence = fast_parse("Check EC2 cost every minute. If cost is above $100, suggest rightsizing.")
+    assert parsed["anomalyCondition"] == "cost > 100"
+    assert confidence >= FAST_PARSE_MIN_CONFIDENCE
+
+@pytest.mark.parametrize("query", [
+    "Check EC2 cost every minute. If cost is not above $100, suggest rightsizing.",
+    "Check EC2 cost every minute. If cost never exceeds $100, suggest rightsizing.",
+    "Check EC2 cost every minute. If cost doesn't exceed $100, suggest rightsizing.",
+    "Check EC2 cost every minute. If cost isn't below $100, suggest rightsizing.",
+    "Check EC2 cost every minute. If cost is no more than $100, suggest rightsizing.",
+])
+def test_negated_comparison_falls_back_to_llm(query):
+    _, confidence = fast_parse(query)
+    assert confidence < FAST_PARSE_MIN_CONFIDENCE
@@ -0,0 +1,43 @@
+# tests/test_parse_cache.py
+# Run from finops-backend/: python -m pytest -q tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from parse_cache import normalize_query_text, parse_cache_key, extract_query_template, store_template_parse, get_template_parse
+
+PROMPT_VERSION = "test-prompt"
+
+def cache_key(query: str) -> str:
+    return parse_cache_key(normalize_query_text(query), PROMPT_VERSION)
+
+def test_trivial_differences_share_a_key():
+    assert cache_key("Alert if EC2 cost > $100 every minute.") == cache_key("alert if ec2   cost > $100 every minute")
+
+@pytest.mark.parametrize("operator, other", [(">", "<"), (">", ">="), ("<", "<="), ("=", "!="), (">", "=")])
+def test_queries_differing_only_by_operator_get_different_keys(operator, other):
+    assert cache_key(f"alert if ec2 cost {operator} $100 every minute") != cache_key(f"alert if ec2 cost {other} $100 every minute")
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME", str(tmp_path / "parse_cache.db"))
+    database.init_db()
+    yield
+    database.close_all_db_connections()
+
+def test_template_signature_keeps_the_operator():
+    greater, _ = extract_query_template("Monitor AWS_CE_SVC_1 every minute. If cost > $100, suggest rightsizing.")
+    less, _ = extract_query_template("Monitor AWS_CE_SVC_1 every minute. If cost < $100, suggest rightsizing.")
+    assert greater != less
+
+def test_template_hit_does_not_cross_operators(temp_db):
+    store_template_parse("Monitor AWS_CE_SVC_1 every minute. If cost > $100, suggest rightsizing.", PROMPT_VERSION, {
+        "scheduleString": "* * * * *", "anomalyCondition": "cost > 100",
+        "targetService": "AWS_CE_SVC_1", "actionableSuggestion": "Suggest rightsizing."})
+    reused = get_template_parse("Monitor AWS_CE_SVC_2 every minute. If cost > $250, suggest rightsizing.", PROMPT_VERSION)
+    assert reused["anomalyCondition"] == "cost > 250" and reused["targetService"] == "AWS_CE_SVC_2"
+    assert get_template_parse("Monitor AWS_CE_SVC_2 every minute. If cost < $250, suggest rightsizing.", PROMPT_VERSION) is None
@@ -0,0 +1,56 @@
+# tests/test_rolling_state.py
+# Run from finops-backend/: python -m pytest -q tests
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pd = pytest.importorskip("pandas")
+
+from executor import incremental_moving_average
+
+WINDOW = 7
+
+def expected_average(data: "pd.DataFrame") -> float:
+    return data["cost"].rolling(WINDOW, min_periods=1).mean().shift(1).iloc[-1]
+
+def make_data(days: int) -> "pd.DataFrame":
+    return pd.DataFrame({"date": pd.date_range("2026-01-01", periods=days), "cost": [50.0 + day for day in range(days)]})
+
+def append_day(data: "pd.DataFrame", cost: float) -> "pd.DataFrame":
+    next_day = pd.DataFrame({"date": [data["date"].iloc[-1] + pd.Timedelta(days=1)], "cost": [cost]})
+    return pd.concat([data, next_day], ignore_index=True)
+
+def test_appended_rows_match_full_rolling_mean():
+    data = make_data(20)
+    assert incremental_moving_average(("append",), data, "cost", WINDOW) == pytest.approx(expected_average(data))
+    for cost in (80.0, 90.0, float("nan"), 60.0):
+        data = append_day(data, cost)
+        assert incremental_moving_average(("append",), data, "cost", WINDOW) == pytest.approx(expected_average(data))
+
+@pytest.mark.parametrize("append", [False, True])
+def test_value_restated_inside_the_window_rebuilds(append):
+    data = make_data(30)
+    incremental_moving_average(("restated", append), data, "cost", WINDOW)
+    data = data.copy()
+    data.loc[25, "cost"] = 10_000.0 # Restated row inside the window, not the latest one
+    if append:
+        data = append_day(data, 80.0)
+    assert incremental_moving_average(("restated", append), data, "cost", WINDOW) == pytest.approx(expected_average(data))
+
+def test_presorted_snapshot_is_evaluated_in_place(tmp_path, monkeypatch):
+    import executor
+    monkeypatch.setattr(executor, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    condition = f"cost is more than 20% above the {WINDOW}-day average"
+    rule = executor.compile_anomaly_condition(condition)
+    rows = [(day, service, 50.0 + day) for day in range(1, 29) for service in ("EC2", "S3")] + [(29, "EC2", 500.0), (29, "S3", 70.0)]
+    csv_path = tmp_path / "costs.csv"
+    csv_path.write_text("date,service_name,cost\n" + "".join(f"2026-03-{day:02d},{service},{cost}\n" for day, service, cost in reversed(rows)))
+    snapshot = executor.load_data_from_csv({"path": str(csv_path)})
+    before = snapshot.copy()
+    for service, breaching in (("EC2", True), ("S3", False)):
+        incremental = executor.parse_anomaly_condition(condition, snapshot, service, rule, rolling_state_key=("snapshot", service))
+        full = executor.parse_anomaly_condition(condition, before.copy(), service, rule)
+        assert incremental.any() == full.any() == breaching
+    assert snapshot.equals(before)
@@ -8,6 +8,7 @@ import AddDataSourceForm from './components/AddDataSourceForm';
 import DataSourcesDisplay from './components/DataSourcesDisplay';
 
 const API_BASE_URL = 'http://localhost:8000/api';
+const ALERTS_SHOWN = 20; // /api/alerts' default page size
 
 function App() {
   const [checks, setChecks] = useState([]);
@@ -83,14 +84,33 @@ function App() {
     fetchChecks();
     fetchSystemAlerts();
     fetchDataSources();
-    
-    const alertsIntervalId = setInterval(fetchSystemAlerts, 15000);
-    const checksIntervalId = setInterval(fetchChecks, 30000);
+
+    // New alerts and check run outcomes are pushed over Server-Sent Events instead of polled.
+    // EventSource reconnects on its own and resumes after the last event id it received.
+    const events = new EventSource(`${API_BASE_URL}/events`);
+    events.addEventListener('alert', (event) => {
+      const alert = JSON.parse(event.data);
+      // A re-notification of an open incident replaces its earlier entry rather than adding another
+      setSystemAlerts(prevAlerts => [
+        { ...alert, id: `live-${event.lastEventId}` },
+        ...prevAlerts.filter(prevAlert => !alert.dedup_key || prevAlert.dedup_key !== alert.dedup_key),
+      ].slice(0, ALERTS_SHOWN));
+    });
+    events.addEventListener('check_run', (event) => {
+      const { check_id, last_run_at, last_run_status } = JSON.parse(event.data);
+      setChecks(prevChecks => prevChecks.map(check =>
+        check.id === check_id ? { ...check, last_run_at, last_run_status } : check));
+    });
+    events.addEventListener('checks_changed', () => fetchChecks());
+    events.addEventListener('resync', () => { // Missed updates; reload both lists
+      fetchChecks();
+      fetchSystemAlerts();
+    });
+
     const dataSourcesIntervalId = setInterval(fetchDataSources, 60000);
 
     return () => {
-        clearInterval(alertsIntervalId);
-        clearInterval(checksIntervalId);
+        events.close();
         clearInterval(dataSourcesIntervalId);
     };
   }, [fetchChecks, fetchSystemAlerts, fetchDataSources]);
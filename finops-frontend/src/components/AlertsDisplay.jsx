@@ -131,6 +131,16 @@ const AlertsDisplay = ({ alerts }) => {
                               Check ID: {alert.check_id.substring(0, 8)}...
                             </span>
                           )}
+                          {alert.occurrence_count > 1 && (
+                            <span className="text-xs bg-gray-200 text-gray-700 px-2 py-0.5 rounded-full">
+                              ×{alert.occurrence_count}{alert.is_flapping ? ' (flapping)' : ''}
+                            </span>
+                          )}
+                          {alert.state === 'resolved' && (
+                            <span className="text-xs bg-green-100 text-green-700 px-2 py-0.5 rounded-full">
+                              Resolved
+                            </span>
+                          )}
                         </div>
                         
                         {parsedAlert.type === 'structured' ? (